@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import re
-from datetime import datetime, time
-
+from contextlib import contextmanager
+from datetime import datetime, time, tzinfo
+from functools import lru_cache, wraps
+from itertools import groupby
+from operator import itemgetter
+from typing import Awaitable, Callable, Iterable, Iterator
+
+from apscheduler.jobstores.base import JobLookupError
+import dateparser
 from dotenv import load_dotenv
-import requests
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.error import TelegramError
 from telegram.ext import (
@@ -14,23 +21,33 @@ from telegram.ext import (
     CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
+    Job,
     MessageHandler,
     filters,
 )
 
 from .config import Settings, load_settings
-import dateparser
-
-from .database import Task, create_task, delete_task, get_task, init_db, list_future_reminders
 from .database import (
-    list_chat_ids_for_user,
+    SUMMARY_NO_DUE,
+    SUMMARY_OVERDUE,
+    SUMMARY_TODAY,
+    SUMMARY_UPCOMING,
+    Task,
+    TaskSummary,
+    create_task,
+    delete_task,
+    get_task,
+    init_db,
+    list_future_reminders,
     list_tasks,
+    list_tasks_for_summary,
     update_task_fields,
+    update_task_repeat,
     update_task_status,
     update_task_title,
 )
-from .parser import ParsedTask, parse_task_text
-from .utils import format_dt, next_due_date
+from .parser import dateparser_settings, parse_task_text, request_perplexity
+from .utils import format_dt, next_due_date, normalize_parsed_dates
 
 
 logging.basicConfig(
@@ -38,13 +55,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_Handler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[None]]
+
+# APScheduler drops a job that is more than a second late by default. A late
+# reminder (busy loop, paused scheduler during a bulk restore) is still useful.
+_REMINDER_GRACE_SECONDS = 300
+
+# PTB already keeps a 256-connection pool for outgoing calls, but waits only
+# one second for a free connection before raising. Bursts of callback answers
+# and summary sends should queue instead of failing.
+_POOL_TIMEOUT = 20.0
+
+_TEXT_NOT_CMD = filters.TEXT & ~filters.COMMAND
+_CALLBACK_ACTIONS = frozenset(("done", "open", "edit", "resched", "delete", "back"))
+_RE_BULLET = re.compile(r"^[•\-–\*]+\s*")
+_RE_WS = re.compile(r"\s+")
+
+_START_TEXT = (
+    "Привет! Я бот напоминаний.\n"
+    "Просто напиши задачу обычным сообщением.\n"
+    "Пример: Купить молоко завтра в 18:00 напомни за 2 часа"
+)
+_HELP_TEXT = (
+    "Просто отправь сообщение, и оно станет задачей.\n"
+    "Пример: Созвон с клиентом завтра 15:00 напомни за 1 час\n"
+    "Повторы: ежедневно, еженедельно, каждые 3 дня\n"
+    "Команды: /list, /done <id>, /delete <id>, /sync, /cleanup"
+)
+
 
 def _is_allowed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
-    settings: Settings = context.bot_data["settings"]
     user = update.effective_user
-    if not user:
-        return False
-    return user.id in settings.allowed_user_ids
+    return user is not None and user.id in context.bot_data["allowed_ids"]
 
 
 async def _deny(update: Update) -> None:
@@ -52,33 +94,29 @@ async def _deny(update: Update) -> None:
         await update.message.reply_text("Нет доступа.")
 
 
+def _allowed_only(handler: _Handler) -> _Handler:
+    @wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if not _is_allowed(update, context):
+            await _deny(update)
+            return
+        await handler(update, context)
+
+    return wrapper
+
+
+@_allowed_only
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_allowed(update, context):
-        await _deny(update)
-        return
-    await update.message.reply_text(
-        "Привет! Я бот напоминаний.\n"
-        "Просто напиши задачу обычным сообщением.\n"
-        "Пример: Купить молоко завтра в 18:00 напомни за 2 часа"
-    )
+    await update.message.reply_text(_START_TEXT)
 
 
+@_allowed_only
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_allowed(update, context):
-        await _deny(update)
-        return
-    await update.message.reply_text(
-        "Просто отправь сообщение, и оно станет задачей.\n"
-        "Пример: Созвон с клиентом завтра 15:00 напомни за 1 час\n"
-        "Повторы: ежедневно, еженедельно, каждые 3 дня\n"
-        "Команды: /list, /done <id>, /delete <id>, /sync, /cleanup"
-    )
+    await update.message.reply_text(_HELP_TEXT)
 
 
+@_allowed_only
 async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_allowed(update, context):
-        await _deny(update)
-        return
     db_path: str = context.bot_data["db_path"]
     chat_id = update.effective_chat.id if update.effective_chat else None
     if not chat_id or not update.effective_user:
@@ -86,38 +124,37 @@ async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     await _send_task_list(context, chat_id, update.effective_user.id, db_path)
 
 
+@_allowed_only
 async def sync_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_allowed(update, context):
-        await _deny(update)
-        return
-    rescheduled = reschedule_all_reminders(context)
+    rescheduled = await reschedule_all_reminders(context)
     await update.message.reply_text(
         f"✅ Напоминания пересчитаны: {rescheduled}"
     )
 
 
 async def capture_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_allowed(update, context):
-        await _deny(update)
+    text = (update.message.text or "").strip()
+    if not text:
         return
-    if update.effective_user and update.effective_user.is_bot:
+    user = update.effective_user
+    if not user or user.is_bot:
+        return
+    if user.id not in context.bot_data["allowed_ids"]:
+        await _deny(update)
         return
     settings: Settings = context.bot_data["settings"]
     db_path: str = context.bot_data["db_path"]
-    text = (update.message.text or "").strip()
-    if not text:
-        return
     pending = context.user_data.get("pending_action")
     if pending:
         await _handle_pending_action(update, context, pending, text, settings, db_path)
         return
 
     now = datetime.now(settings.tz)
-    parsed = parse_task_text(text, now, settings)
-    due_at, remind_at = _normalize_parsed_dates(parsed, now)
+    parsed = await asyncio.to_thread(parse_task_text, text, now, settings)
+    due_at, remind_at = normalize_parsed_dates(parsed, now)
     task = Task(
         id=None,
-        user_id=update.effective_user.id,
+        user_id=user.id,
         chat_id=update.effective_chat.id,
         title=parsed.title,
         description=parsed.description,
@@ -129,7 +166,7 @@ async def capture_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         created_at=now,
         updated_at=now,
     )
-    task_id = create_task(db_path, task)
+    task_id = await asyncio.to_thread(create_task, db_path, task)
     task.id = task_id
 
     if task.remind_at and task.remind_at > now:
@@ -146,17 +183,21 @@ async def capture_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def reminder_callback(context: ContextTypes.DEFAULT_TYPE) -> None:
     db_path: str = context.bot_data["db_path"]
+    jobs: dict[str, Job] = context.bot_data["reminder_jobs"]
+    if jobs.get(context.job.name) is context.job:
+        del jobs[context.job.name]
     job_data = context.job.data or {}
     task_id = job_data.get("task_id")
     chat_id = job_data.get("chat_id")
     if not task_id or not chat_id:
         return
-    task = get_task(db_path, task_id)
+    task = await asyncio.to_thread(get_task, db_path, task_id)
     if not task or task.status != "open":
         return
-    await context.bot.send_message(
-        chat_id=chat_id,
-        text=(
+    await _send_message(
+        context,
+        chat_id,
+        (
             f"🔔 Напоминание по задаче #{task.id}\n"
             f"{task.title}\n"
             f"Срок: {format_dt(task.due_at)}\n"
@@ -165,48 +206,42 @@ async def reminder_callback(context: ContextTypes.DEFAULT_TYPE) -> None:
     )
 
 
+@_allowed_only
 async def done_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_allowed(update, context):
-        await _deny(update)
-        return
     db_path: str = context.bot_data["db_path"]
     settings: Settings = context.bot_data["settings"]
     if not context.args or not context.args[0].isdigit():
         await update.message.reply_text("Используй: /done <id>")
         return
     task_id = int(context.args[0])
-    task = get_task(db_path, task_id, update.effective_user.id)
+    task = await asyncio.to_thread(get_task, db_path, task_id, update.effective_user.id)
     if not task:
         await update.message.reply_text("Задача не найдена.")
         return
-    message = _complete_task(task, context, settings, db_path)
+    message = await _complete_task(task, context, settings, db_path)
     await update.message.reply_text(message)
 
 
+@_allowed_only
 async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_allowed(update, context):
-        await _deny(update)
-        return
     db_path: str = context.bot_data["db_path"]
     if not context.args or not context.args[0].isdigit():
         await update.message.reply_text("Используй: /delete <id>")
         return
     task_id = int(context.args[0])
-    task = get_task(db_path, task_id, update.effective_user.id)
+    task = await asyncio.to_thread(get_task, db_path, task_id, update.effective_user.id)
     if not task:
         await update.message.reply_text("Задача не найдена.")
         return
-    if delete_task(db_path, task_id, update.effective_user.id):
+    if await asyncio.to_thread(delete_task, db_path, task_id, update.effective_user.id):
         remove_reminder(context.application, task_id)
         await update.message.reply_text("🗑️ Задача удалена.")
         return
     await update.message.reply_text("Не удалось удалить задачу.")
 
 
+@_allowed_only
 async def cleanup_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    if not _is_allowed(update, context):
-        await _deny(update)
-        return
     db_path: str = context.bot_data["db_path"]
     chat_id = update.effective_chat.id if update.effective_chat else None
     if not chat_id or not update.effective_user:
@@ -215,9 +250,11 @@ async def cleanup_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     settings: Settings = context.bot_data["settings"]
     keep_lines = _extract_keep_lines(raw)
     if not keep_lines and settings.perplexity_api_key:
-        keep_lines = _extract_keep_lines_with_perplexity(raw, settings)
+        keep_lines = await asyncio.to_thread(_extract_keep_lines_with_perplexity, raw, settings)
     if keep_lines:
-        removed_ids = _cleanup_tasks(db_path, update.effective_user.id, keep_lines)
+        removed_ids = await asyncio.to_thread(
+            _cleanup_tasks, db_path, update.effective_user.id, keep_lines
+        )
         for task_id in removed_ids:
             remove_reminder(context.application, task_id)
         await update.message.reply_text(f"🧹 Удалено задач: {len(removed_ids)}")
@@ -237,33 +274,47 @@ async def done_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     if not _is_allowed(update, context):
         await query.answer("Нет доступа", show_alert=True)
         return
-    await query.answer("Ок")
     action, task_id_text = _parse_callback(query.data)
+    task = None
+    if action and action != "back":
+        try:
+            task_id = int(task_id_text)
+        except ValueError:
+            await query.answer("Некорректный id", show_alert=True)
+            return
+        user_id = update.effective_user.id if update.effective_user else None
+        task = await asyncio.to_thread(get_task, context.bot_data["db_path"], task_id, user_id)
+        if not task:
+            await query.answer("Задача не найдена", show_alert=True)
+            return
+    # Telegram takes one answer per callback, so the alerts above replace the
+    # ack. Once they are ruled out, acknowledge right away so the client stops
+    # its spinner, letting the round-trip overlap with the action below.
+    ack = asyncio.create_task(query.answer("Ок"))
+    try:
+        await _dispatch_callback(update, context, query, action, task)
+    finally:
+        await ack
+
+
+async def _dispatch_callback(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    query,
+    action: str | None,
+    task: Task | None,
+) -> None:
     if not action:
         return
+    db_path: str = context.bot_data["db_path"]
     if action == "back":
         await _finalize_callback(query, "Ок")
         if update.effective_chat and update.effective_user:
-            await _send_task_list(
-                context,
-                update.effective_chat.id,
-                update.effective_user.id,
-                context.bot_data["db_path"],
-            )
-        return
-    if not task_id_text.isdigit():
-        await query.answer("Некорректный id", show_alert=True)
+            await _send_task_list(context, update.effective_chat.id, update.effective_user.id, db_path)
         return
-    task_id = int(task_id_text)
-    db_path: str = context.bot_data["db_path"]
     settings: Settings = context.bot_data["settings"]
-    user_id = update.effective_user.id if update.effective_user else None
-    task = get_task(db_path, task_id, user_id)
-    if not task:
-        await query.answer("Задача не найдена", show_alert=True)
-        return
     if action == "done":
-        message = _complete_task(task, context, settings, db_path)
+        message = await _complete_task(task, context, settings, db_path)
         await _finalize_callback(query, message)
         if update.effective_chat and update.effective_user:
             await _send_task_list(context, update.effective_chat.id, update.effective_user.id, db_path)
@@ -284,7 +335,7 @@ async def done_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         await _finalize_callback(query, "Напиши новую дату/время (например: завтра 18:00).")
         return
     if action == "delete":
-        if delete_task(db_path, task.id, task.user_id):
+        if await asyncio.to_thread(delete_task, db_path, task.id, task.user_id):
             remove_reminder(context.application, task.id)
             await _finalize_callback(query, "🗑️ Задача удалена.")
             if update.effective_chat and update.effective_user:
@@ -294,98 +345,170 @@ async def done_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         return
 
 
-def schedule_reminder(app: Application, task: Task) -> None:
+def schedule_reminder(app: Application, task: Task | TaskSummary) -> None:
     if not task.remind_at:
         return
+    # The job name doubles as the APScheduler id, so scheduling a task again
+    # replaces its previous reminder in one scheduler operation.
     name = f"remind_{task.id}"
-    for job in app.job_queue.get_jobs_by_name(name):
-        job.schedule_removal()
-    app.job_queue.run_once(
+    app.bot_data["reminder_jobs"][name] = app.job_queue.run_once(
         reminder_callback,
         when=task.remind_at,
         name=name,
         data={"task_id": task.id, "chat_id": task.chat_id},
+        job_kwargs={
+            "id": name,
+            "replace_existing": True,
+            "misfire_grace_time": _REMINDER_GRACE_SECONDS,
+        },
     )
 
 
 def remove_reminder(app: Application, task_id: int) -> None:
-    name = f"remind_{task_id}"
-    for job in app.job_queue.get_jobs_by_name(name):
+    _drop_job(app.bot_data["reminder_jobs"].pop(f"remind_{task_id}", None))
+
+
+def _drop_job(job: Job | None) -> None:
+    if job is None:
+        return
+    try:
         job.schedule_removal()
+    except JobLookupError:
+        # One-off job has already fired and left the scheduler.
+        pass
+
+
+# Telegram allows about 30 messages per second overall and roughly one per
+# second in a single chat; bot-initiated sends stay under both.
+_SEND_RATE = 25
+_SEND_CHAT_INTERVAL = 1.0
+
+
+class _SendLimiter:
+    # Hands out send slots at most _SEND_RATE per second overall and one per
+    # _SEND_CHAT_INTERVAL per chat. Runs on the event loop only, so reserving
+    # a slot needs no lock.
+    def __init__(self) -> None:
+        self._next_slot = 0.0
+        # Slots only move forward, so re-inserting each chat at the end keeps
+        # the dict ordered by expiry and passed entries can be cut from the
+        # front; only chats with a pending interval are kept.
+        self._next_chat_slot: dict[int, float] = {}
+
+    async def wait(self, chat_id: int) -> None:
+        now = asyncio.get_running_loop().time()
+        chat_slots = self._next_chat_slot
+        slot = max(now, self._next_slot, chat_slots.pop(chat_id, 0.0))
+        self._next_slot = slot + 1 / _SEND_RATE
+        while chat_slots:
+            oldest = next(iter(chat_slots))
+            if chat_slots[oldest] > now:
+                break
+            del chat_slots[oldest]
+        chat_slots[chat_id] = slot + _SEND_CHAT_INTERVAL
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def _send_message(context: ContextTypes.DEFAULT_TYPE, chat_id: int, text: str, **kwargs) -> None:
+    await context.bot_data["send_limiter"].wait(chat_id)
+    await context.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+
+
+# Summaries go out in parallel, but no more than this many at once; the send
+# limiter keeps them under Telegram's rate limits.
+_SUMMARY_CONCURRENCY = 10
+_SUMMARY_SECTIONS = {
+    SUMMARY_OVERDUE: "Просроченные:",
+    SUMMARY_TODAY: "Сегодня:",
+    SUMMARY_UPCOMING: "Скоро:",
+    SUMMARY_NO_DUE: "Без срока:",
+}
 
 
 async def daily_summary(context: ContextTypes.DEFAULT_TYPE) -> None:
     db_path: str = context.bot_data["db_path"]
     settings: Settings = context.bot_data["settings"]
-    now = datetime.now(settings.tz)
-    today = now.date()
-    for user_id in settings.allowed_user_ids:
-        chat_ids = list_chat_ids_for_user(db_path, user_id)
-        for chat_id in chat_ids:
-            tasks = [
-                task
-                for task in list_tasks(db_path, user_id, status="open")
-                if task.chat_id == chat_id
-            ]
-            if not tasks:
-                continue
-            overdue: list[Task] = []
-            today_tasks: list[Task] = []
-            upcoming: list[Task] = []
-            no_due: list[Task] = []
-            for task in tasks:
-                if not task.due_at:
-                    no_due.append(task)
-                    continue
-                if task.due_at.date() < today:
-                    overdue.append(task)
-                elif task.due_at.date() == today:
-                    today_tasks.append(task)
-                else:
-                    upcoming.append(task)
-
-            lines = [f"📋 Список задач ({len(tasks)}):"]
-            if overdue:
-                lines.append("Просроченные:")
-                lines.extend(_format_task_lines(overdue))
-            if today_tasks:
-                lines.append("Сегодня:")
-                lines.extend(_format_task_lines(today_tasks))
-            if upcoming:
-                lines.append("Скоро:")
-                lines.extend(_format_task_lines(upcoming))
-            if no_due:
-                lines.append("Без срока:")
-                lines.extend(_format_task_lines(no_due))
-            await context.bot.send_message(chat_id=chat_id, text="\n".join(lines))
-
-
-def reschedule_all_reminders(context: ContextTypes.DEFAULT_TYPE) -> int:
+    allowed_ids: frozenset[int] = context.bot_data["allowed_ids"]
+    today = datetime.now(settings.tz).date()
+    messages: list[tuple[int, str]] = []
+    grouped = await asyncio.to_thread(list_tasks_for_summary, db_path, today)
+    for chat_id, chat_rows in grouped.items():
+        rows = [(bucket, task) for bucket, task in chat_rows if task.user_id in allowed_ids]
+        if rows:
+            messages.append((chat_id, _build_summary_text(rows)))
+    semaphore = asyncio.Semaphore(_SUMMARY_CONCURRENCY)
+    results = await asyncio.gather(
+        *(_send_bounded(context, semaphore, chat_id, text) for chat_id, text in messages),
+        return_exceptions=True,
+    )
+    for (chat_id, _), result in zip(messages, results):
+        if isinstance(result, Exception):
+            logger.error("Failed to send daily summary to %s: %s", chat_id, result)
+
+
+async def _send_bounded(
+    context: ContextTypes.DEFAULT_TYPE, semaphore: asyncio.Semaphore, chat_id: int, text: str
+) -> None:
+    async with semaphore:
+        await _send_message(context, chat_id, text)
+
+
+def _build_summary_text(rows: list[tuple[int, Task]]) -> str:
+    lines = [f"📋 Список задач ({len(rows)}):"]
+    for bucket, group in groupby(rows, key=itemgetter(0)):
+        lines.append(_SUMMARY_SECTIONS[bucket])
+        lines.extend(_format_task_lines(task for _, task in group))
+    return "\n".join(lines)
+
+
+async def reschedule_all_reminders(context: ContextTypes.DEFAULT_TYPE) -> int:
     db_path: str = context.bot_data["db_path"]
     settings: Settings = context.bot_data["settings"]
     _remove_all_reminders(context.application)
     now = datetime.now(settings.tz)
-    count = 0
-    for task in list_future_reminders(db_path, now):
-        schedule_reminder(context.application, task)
-        count += 1
-    return count
+    tasks = await asyncio.to_thread(list_future_reminders, db_path, now)
+    return _schedule_reminders(context.application, tasks)
 
 
-def _remove_all_reminders(app: Application) -> None:
-    for job in list(app.job_queue.jobs()):
-        if job.name and job.name.startswith("remind_"):
-            job.schedule_removal()
+def _schedule_reminders(app: Application, tasks: list[TaskSummary]) -> int:
+    with _paused_scheduler(app):
+        for task in tasks:
+            schedule_reminder(app, task)
+    return len(tasks)
+
+
+@contextmanager
+def _paused_scheduler(app: Application) -> Iterator[None]:
+    # Adding jobs to a running scheduler wakes it up on every insert; pausing
+    # it lets a batch go in with a single wakeup on resume. Before the
+    # application has started (post_init) the scheduler only buffers jobs.
+    scheduler = app.job_queue.scheduler
+    if not scheduler.running:
+        yield
+        return
+    scheduler.pause()
+    try:
+        yield
+    finally:
+        scheduler.resume()
 
 
+def _remove_all_reminders(app: Application) -> None:
+    jobs: dict[str, Job] = app.bot_data["reminder_jobs"]
+    for job in jobs.values():
+        _drop_job(job)
+    jobs.clear()
 
 
 async def on_startup(app: Application) -> None:
     settings: Settings = app.bot_data["settings"]
     db_path: str = app.bot_data["db_path"]
     now = datetime.now(settings.tz)
-    for task in list_future_reminders(db_path, now):
-        schedule_reminder(app, task)
+    _schedule_reminders(app, await asyncio.to_thread(list_future_reminders, db_path, now))
+    # dateparser loads its Russian locale data lazily on first use; do it now
+    # instead of inside the first user's request.
+    await asyncio.to_thread(dateparser.parse, "сегодня", languages=["ru"])
     for hour in (10, 15, 19):
         app.job_queue.run_daily(
             daily_summary,
@@ -394,33 +517,50 @@ async def on_startup(app: Application) -> None:
         )
 
 
-def _format_task_lines(tasks: list[Task]) -> list[str]:
-    lines = []
+def _format_task_lines(tasks: Iterable[Task]) -> Iterator[str]:
     for task in tasks:
-        title = " ".join(task.title.split())
-        parts = [f"• {title}"]
-        if task.due_at:
-            parts.append(f"срок: {format_dt(task.due_at)}")
-        if task.remind_at:
-            parts.append(f"напомнить: {format_dt(task.remind_at)}")
-        lines.append(" | ".join(parts))
-    return lines
+        yield _format_task_line(task)
+
+
+def _format_task_line(task: Task) -> str:
+    title = task.title
+    if task.due_at and task.remind_at:
+        return (
+            f"• {title} | срок: {_format_dt_cached(task.due_at, task.due_at.tzinfo)}"
+            f" | напомнить: {_format_dt_cached(task.remind_at, task.remind_at.tzinfo)}"
+        )
+    if task.due_at:
+        return f"• {title} | срок: {_format_dt_cached(task.due_at, task.due_at.tzinfo)}"
+    if task.remind_at:
+        return f"• {title} | напомнить: {_format_dt_cached(task.remind_at, task.remind_at.tzinfo)}"
+    return f"• {title}"
+
+
+@lru_cache(maxsize=4096)
+def _format_dt_cached(dt: datetime, zone: tzinfo | None) -> str:
+    # Aware datetimes compare equal across time zones, so the zone is part of
+    # the key; otherwise 12:00 UTC could come back rendered as 15:00 MSK.
+    return format_dt(dt)
 
 
-def _build_list_keyboard(tasks: list[Task]) -> list[list[InlineKeyboardButton]]:
+def _render_tasks(tasks: list[Task]) -> tuple[list[str], list[list[InlineKeyboardButton]]]:
+    lines: list[str] = []
     keyboard: list[list[InlineKeyboardButton]] = []
     for task in tasks:
-        title = " ".join(task.title.split())
-        label = title if len(title) <= 40 else f"{title[:37]}..."
-        keyboard.append(
-            [
-                InlineKeyboardButton(f"📝 {label}", callback_data=f"open:{task.id}"),
-            ]
-        )
-    return keyboard
+        lines.append(_format_task_line(task))
+        keyboard.append([_open_button(task.id, task.title)])
+    return lines, keyboard
+
 
+@lru_cache(maxsize=1024)
+def _open_button(task_id: int, title: str) -> InlineKeyboardButton:
+    # Telegram objects are immutable, so one button per (task, title) is
+    # reused across every list render until the title changes.
+    label = title if len(title) <= 40 else f"{title[:37]}..."
+    return InlineKeyboardButton(f"📝 {label}", callback_data=f"open:{task_id}")
 
-def _complete_task(
+
+async def _complete_task(
     task: Task,
     context: ContextTypes.DEFAULT_TYPE,
     settings: Settings,
@@ -436,56 +576,68 @@ def _complete_task(
             candidate = next_due - offset
             if candidate > now:
                 new_remind = candidate
-        update_task_fields(
+        await asyncio.to_thread(
+            update_task_repeat,
             db_path,
             task.id,
             due_at=next_due,
             remind_at=new_remind,
             repeat_rule=task.repeat_rule,
+            updated_at=now,
         )
-        update_task_status(db_path, task.id, "open", datetime.utcnow())
         if new_remind:
             task.due_at = next_due
             task.remind_at = new_remind
             schedule_reminder(context.application, task)
         return f"✅ Повтор перенесён на {format_dt(next_due)}"
-    update_task_status(db_path, task.id, "done", datetime.utcnow())
+    await asyncio.to_thread(update_task_status, db_path, task.id, "done", now)
     remove_reminder(context.application, task.id)
     return "✅ Задача отмечена выполненной."
 
 
 def _parse_callback(data: str) -> tuple[str | None, str]:
-    if ":" not in data:
-        return None, ""
-    action, task_id_text = data.split(":", 1)
-    if action not in {"done", "open", "edit", "resched", "delete", "back"}:
+    action, sep, task_id_text = data.partition(":")
+    if not sep or action not in _CALLBACK_ACTIONS:
         return None, ""
     return action, task_id_text
 
 
 async def _finalize_callback(query, message: str) -> None:
-    try:
-        await query.edit_message_reply_markup(reply_markup=None)
-        await query.message.reply_text(message)
-    except TelegramError:
-        logger.exception("Failed to edit message after callback")
-        if query.message:
-            await query.message.reply_text(message)
+    if not query.message:
+        try:
+            await query.edit_message_reply_markup(reply_markup=None)
+        except TelegramError:
+            logger.exception("Failed to edit message after callback")
+        return
+    # Removing the buttons and posting the reply touch different messages, so
+    # both requests go out together.
+    edited, replied = await asyncio.gather(
+        query.edit_message_reply_markup(reply_markup=None),
+        query.message.reply_text(message),
+        return_exceptions=True,
+    )
+    if isinstance(edited, TelegramError):
+        logger.error("Failed to edit message after callback", exc_info=edited)
+    elif isinstance(edited, BaseException):
+        raise edited
+    if isinstance(replied, BaseException):
+        raise replied
 
 
 async def _send_task_list(
     context: ContextTypes.DEFAULT_TYPE, chat_id: int, user_id: int, db_path: str
 ) -> None:
-    tasks = list_tasks(db_path, user_id, status="open")
+    tasks = await asyncio.to_thread(list_tasks, db_path, user_id, "open")
     if not tasks:
-        await context.bot.send_message(chat_id=chat_id, text="Открытых задач нет.")
+        await _send_message(context, chat_id, "Открытых задач нет.")
         return
+    task_lines, keyboard = _render_tasks(tasks)
     lines = [f"📋 Открытые задачи ({len(tasks)}):"]
-    lines.extend(_format_task_lines(tasks))
-    keyboard = _build_list_keyboard(tasks)
-    await context.bot.send_message(
-        chat_id=chat_id,
-        text="\n".join(lines),
+    lines.extend(task_lines)
+    await _send_message(
+        context,
+        chat_id,
+        "\n".join(lines),
         reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None,
     )
 
@@ -499,20 +651,27 @@ async def _send_task_detail(context: ContextTypes.DEFAULT_TYPE, chat_id: int, ta
     if task.repeat_rule:
         lines.append(f"Повтор: {task.repeat_rule}")
     text = "\n".join(lines)
-    keyboard = InlineKeyboardMarkup(
-        [
-            [
-                InlineKeyboardButton("✅ Выполнено", callback_data=f"done:{task.id}"),
-                InlineKeyboardButton("✏️ Текст", callback_data=f"edit:{task.id}"),
-            ],
-            [
-                InlineKeyboardButton("⏰ Время", callback_data=f"resched:{task.id}"),
-                InlineKeyboardButton("🗑 Удалить", callback_data=f"delete:{task.id}"),
-            ],
-            [InlineKeyboardButton("⬅️ Назад к списку", callback_data="back:0")],
-        ]
-    )
-    await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=keyboard)
+    keyboard = _detail_keyboard(task.id)
+    await _send_message(context, chat_id, text, reply_markup=keyboard)
+
+
+_DETAIL_ROWS = (
+    (("✅ Выполнено", "done"), ("✏️ Текст", "edit")),
+    (("⏰ Время", "resched"), ("🗑 Удалить", "delete")),
+)
+_BACK_ROW = (InlineKeyboardButton("⬅️ Назад к списку", callback_data="back:0"),)
+
+
+@lru_cache(maxsize=1024)
+def _detail_keyboard(task_id: int) -> InlineKeyboardMarkup:
+    # Only the task id varies between detail screens; the markup is immutable
+    # and safe to hand out again on the next "open" tap.
+    rows = [
+        [InlineKeyboardButton(label, callback_data=f"{action}:{task_id}") for label, action in row]
+        for row in _DETAIL_ROWS
+    ]
+    rows.append(_BACK_ROW)
+    return InlineKeyboardMarkup(rows)
 
 
 async def _handle_pending_action(
@@ -532,13 +691,15 @@ async def _handle_pending_action(
     if action_type == "cleanup_keep":
         keep_lines = _extract_keep_lines(text)
         if not keep_lines and settings.perplexity_api_key:
-            keep_lines = _extract_keep_lines_with_perplexity(text, settings)
+            keep_lines = await asyncio.to_thread(_extract_keep_lines_with_perplexity, text, settings)
         if not keep_lines:
             await update.message.reply_text(
                 "Не нашёл задач в сообщении. Пришли список ещё раз."
             )
             return
-        removed_ids = _cleanup_tasks(db_path, update.effective_user.id, keep_lines)
+        removed_ids = await asyncio.to_thread(
+            _cleanup_tasks, db_path, update.effective_user.id, keep_lines
+        )
         for removed_id in removed_ids:
             remove_reminder(context.application, removed_id)
         context.user_data.pop("pending_action", None)
@@ -546,7 +707,7 @@ async def _handle_pending_action(
         if update.effective_chat:
             await _send_task_list(context, update.effective_chat.id, update.effective_user.id, db_path)
         return
-    task = get_task(db_path, task_id, update.effective_user.id)
+    task = await asyncio.to_thread(get_task, db_path, task_id, update.effective_user.id)
     if not task:
         context.user_data.pop("pending_action", None)
         await update.message.reply_text("Задача не найдена.")
@@ -556,12 +717,12 @@ async def _handle_pending_action(
         if not clean:
             await update.message.reply_text("Текст не должен быть пустым.")
             return
-        update_task_title(db_path, task.id, clean)
+        await asyncio.to_thread(update_task_title, db_path, task.id, clean)
         context.user_data.pop("pending_action", None)
         await update.message.reply_text("✅ Текст обновлён.")
     elif action_type == "reschedule":
         now = datetime.now(settings.tz)
-        new_due = _parse_user_datetime(text, settings, now)
+        new_due = await asyncio.to_thread(_parse_user_datetime, text, settings, now)
         if not new_due:
             await update.message.reply_text(
                 "Не понял дату. Пример: завтра 18:00"
@@ -574,7 +735,8 @@ async def _handle_pending_action(
             candidate = new_due - offset
             if candidate > now:
                 new_remind = candidate
-        update_task_fields(
+        await asyncio.to_thread(
+            update_task_fields,
             db_path,
             task.id,
             due_at=new_due,
@@ -598,12 +760,7 @@ def _parse_user_datetime(text: str, settings: Settings, now: datetime) -> dateti
     parsed = dateparser.parse(
         text,
         languages=["ru"],
-        settings={
-            "RELATIVE_BASE": now,
-            "TIMEZONE": str(settings.tz),
-            "RETURN_AS_TIMEZONE_AWARE": True,
-            "PREFER_DATES_FROM": "future",
-        },
+        settings=dateparser_settings(now, settings.tz),
     )
     return parsed if parsed and parsed > now else None
 
@@ -616,14 +773,14 @@ def _extract_keep_lines(text: str) -> list[str]:
             continue
         if line.startswith("/cleanup"):
             line = line[len("/cleanup") :].strip()
-        line = re.sub(r"^[•\-–\*]+\s*", "", line)
+        line = _RE_BULLET.sub("", line)
         if line:
             lines.append(line)
     return lines
 
 
 def _normalize_title(value: str) -> str:
-    return re.sub(r"\s+", " ", value).strip().lower()
+    return _RE_WS.sub(" ", value).strip().lower()
 
 
 def _cleanup_tasks(db_path: str, user_id: int, keep_lines: list[str]) -> list[int]:
@@ -643,30 +800,6 @@ def _cleanup_tasks(db_path: str, user_id: int, keep_lines: list[str]) -> list[in
     return removed_ids
 
 
-def _normalize_parsed_dates(
-    parsed: ParsedTask, now: datetime
-) -> tuple[datetime | None, datetime | None]:
-    due_at = parsed.due_at
-    remind_at = parsed.remind_at
-    if due_at and parsed.repeat_rule and due_at <= now:
-        candidate = due_at
-        for _ in range(366):
-            if candidate and candidate > now:
-                break
-            candidate = next_due_date(candidate, parsed.repeat_rule)
-        if candidate and candidate > now:
-            if remind_at and due_at and remind_at < due_at:
-                offset = due_at - remind_at
-                candidate_remind = candidate - offset
-                remind_at = candidate_remind if candidate_remind > now else None
-            due_at = candidate
-    if remind_at and remind_at <= now:
-        remind_at = None
-    if remind_at and not due_at:
-        due_at = remind_at
-    return due_at, remind_at
-
-
 def _extract_keep_lines_with_perplexity(text: str, settings: Settings) -> list[str]:
     prompt = (
         "Ты помощник для управления задачами. Из текста пользователя извлеки список задач, "
@@ -678,24 +811,8 @@ def _extract_keep_lines_with_perplexity(text: str, settings: Settings) -> list[s
         f"Текст: {text}\n"
         "JSON:"
     )
-    headers = {
-        "Authorization": f"Bearer {settings.perplexity_api_key}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "model": "sonar",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.1,
-    }
     try:
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=20,
-        )
-        response.raise_for_status()
-        content = response.json()["choices"][0]["message"]["content"]
+        content = request_perplexity(settings, prompt)
         data = _safe_json_array(content)
         if not data:
             logger.warning("Perplexity cleanup parse failed, content=%r", content[:500])
@@ -733,11 +850,15 @@ def main() -> None:
     application = (
         Application.builder()
         .token(settings.bot_token)
+        .pool_timeout(_POOL_TIMEOUT)
         .post_init(on_startup)
         .build()
     )
     application.bot_data["settings"] = settings
     application.bot_data["db_path"] = settings.db_path
+    application.bot_data["allowed_ids"] = frozenset(settings.allowed_user_ids)
+    application.bot_data["reminder_jobs"] = {}
+    application.bot_data["send_limiter"] = _SendLimiter()
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
@@ -748,11 +869,13 @@ def main() -> None:
     application.add_handler(CommandHandler("sync", sync_command))
     application.add_handler(CallbackQueryHandler(done_callback))
     application.add_handler(
-        MessageHandler(filters.TEXT & ~filters.COMMAND, capture_message)
+        MessageHandler(_TEXT_NOT_CMD, capture_message)
     )
     application.run_polling(
+        poll_interval=0.0,
+        timeout=30,
         close_loop=False,
-        allowed_updates=["message", "callback_query"],
+        allowed_updates=[Update.MESSAGE, Update.CALLBACK_QUERY],
     )
 
 
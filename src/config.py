@@ -2,18 +2,22 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 
 
-@dataclass(frozen=True)
+@dataclass(slots=True, frozen=True)
 class Settings:
     bot_token: str
     db_path: str
     tz: ZoneInfo
     perplexity_api_key: str | None
-    allowed_user_ids: set[int]
+    allowed_user_ids: frozenset[int]
 
 
+# The environment is read once per process; call reset_settings_cache() after
+# changing it (tests, a reloaded .env) to pick up new values.
+@lru_cache(maxsize=1)
 def load_settings() -> Settings:
     bot_token = os.getenv("BOT_TOKEN", "").strip()
     if not bot_token:
@@ -27,11 +31,9 @@ def load_settings() -> Settings:
     allowed_raw = os.getenv("ALLOWED_USER_IDS", "").strip()
     if not allowed_raw:
         raise ValueError("ALLOWED_USER_IDS is required")
-    allowed_user_ids = {
-        int(part.strip())
-        for part in allowed_raw.split(",")
-        if part.strip().isdigit()
-    }
+    allowed_user_ids = frozenset(
+        int(part) for part in map(str.strip, allowed_raw.split(",")) if part.isdigit()
+    )
     if not allowed_user_ids:
         raise ValueError("ALLOWED_USER_IDS must contain at least one user id")
 
@@ -42,3 +44,7 @@ def load_settings() -> Settings:
         perplexity_api_key=perplexity_api_key,
         allowed_user_ids=allowed_user_ids,
     )
+
+
+def reset_settings_cache() -> None:
+    load_settings.cache_clear()
@@ -2,12 +2,18 @@ from __future__ import annotations
 
 import os
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Iterable
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from itertools import groupby
+from typing import Iterator, NamedTuple, Sequence
 
 
-@dataclass
+@dataclass(slots=True)
 class Task:
     id: int | None
     user_id: int
@@ -23,35 +29,164 @@ class Task:
     updated_at: datetime
 
 
+_local = threading.local()
+
+# Short-lived cache of task rows fetched by id. A task is usually read several
+# times in a row (list render, button tap, reminder) while it rarely changes,
+# and every write below drops the cached row. Each drop also bumps the
+# generation: a reader that SELECTed before a concurrent write caches its row
+# only if the generation it saw beforehand is still current.
+_TASK_CACHE_SIZE = 256
+_TASK_CACHE_TTL = 5.0
+_task_cache: OrderedDict[tuple[str, int], tuple[float, sqlite3.Row]] = OrderedDict()
+_task_cache_lock = threading.Lock()
+_task_cache_generation = 0
+
+# Server-side UTC stamp for updated_at, in the ISO layout (with an explicit
+# +00:00 offset) that datetime.fromisoformat reads back as an aware value,
+# like the local-time stamps callers pass in; saves building a datetime per
+# write.
+_SQL_NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now') || '+00:00'"
+
+
 def _connect(db_path: str) -> sqlite3.Connection:
-    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(db_path, isolation_level=None)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-65536")
+    return conn
+
+
+@contextmanager
+def _txn(conn: sqlite3.Connection) -> Iterator[None]:
+    # Connections run in autocommit mode; this groups several writes into one
+    # commit. Nested use joins the transaction that is already open.
+    if conn.in_transaction:
+        yield
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        # Rows read inside the transaction may have been cached.
+        _clear_task_cache()
+        raise
+    conn.execute("COMMIT")
+
+
+@contextmanager
+def transaction(db_path: str) -> Iterator[None]:
+    # Wraps several helper calls made from the same thread in one commit.
+    with _txn(_get_conn(db_path)):
+        yield
+
+
+def _get_conn(db_path: str) -> sqlite3.Connection:
+    # One autocommit connection per thread and database file. Handlers reach
+    # the database from asyncio.to_thread workers, so connections are never
+    # shared between threads.
+    conns: dict[str, sqlite3.Connection] | None = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = conns[db_path] = _connect(db_path)
     return conn
 
 
+# Per-user and per-chat listings filter on owner and status; reminder and due
+# scans only ever look at open tasks, so their indexes are partial.
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_tasks_user_status ON tasks(user_id, status, due_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_chat_status ON tasks(chat_id, status, due_at)",
+    "DROP INDEX IF EXISTS idx_tasks_open_remind",
+    "DROP INDEX IF EXISTS idx_tasks_open_due",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_open_remind_ts ON tasks(remind_at_ts)"
+    " WHERE status = 'open'",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_open_due_ts ON tasks(due_at_ts) WHERE status = 'open'",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_notion ON tasks(notion_page_id)"
+    " WHERE notion_page_id IS NOT NULL",
+)
+
+
 def init_db(db_path: str) -> None:
-    with _connect(db_path) as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                chat_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT,
-                due_at TEXT,
-                remind_at TEXT,
-                repeat_rule TEXT,
-                notion_page_id TEXT,
-                status TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-            """
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = _get_conn(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            due_at TEXT,
+            remind_at TEXT,
+            repeat_rule TEXT,
+            notion_page_id TEXT,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            due_at_ts INTEGER,
+            remind_at_ts INTEGER
         )
-        _ensure_column(conn, "tasks", "notion_page_id", "TEXT")
-        conn.commit()
+        """
+    )
+    _ensure_column(conn, "tasks", "notion_page_id", "TEXT")
+    _ensure_column(conn, "tasks", "due_at_ts", "INTEGER")
+    _ensure_column(conn, "tasks", "remind_at_ts", "INTEGER")
+    _backfill_timestamps(conn)
+    _mark_naive_stamps_utc(conn)
+    for statement in _INDEXES:
+        conn.execute(statement)
+    _normalize_stored_titles(conn)
+
+
+def _backfill_timestamps(conn: sqlite3.Connection) -> None:
+    # SQLite reads the stored offset and treats naive values as UTC, the same
+    # rule _to_ts applies on write.
+    with _txn(conn):
+        for column in ("due_at", "remind_at"):
+            conn.execute(
+                f"""
+                UPDATE tasks SET {column}_ts = CAST(strftime('%s', {column}) AS INTEGER)
+                WHERE {column} IS NOT NULL AND {column} != '' AND {column}_ts IS NULL
+                """
+            )
+
+
+def _mark_naive_stamps_utc(conn: sqlite3.Connection) -> None:
+    # Older writes stored naive UTC text (datetime.utcnow() or the SQL stamp
+    # without an offset); give them +00:00 so every stamp reads back aware.
+    with _txn(conn):
+        for column in ("created_at", "updated_at"):
+            conn.execute(
+                f"""
+                UPDATE tasks SET {column} = {column} || '+00:00'
+                WHERE substr({column}, -6, 1) NOT IN ('+', '-') AND substr({column}, -1) != 'Z'
+                """
+            )
+
+
+def _clean_title(title: str) -> str:
+    return " ".join(title.split())
+
+
+def _normalize_stored_titles(conn: sqlite3.Connection) -> None:
+    # Titles are stored whitespace-normalized so renders can use them as is;
+    # rows written before that (or by other tools) are fixed up on startup.
+    fixes = [
+        (clean, row["id"])
+        for row in conn.execute("SELECT id, title FROM tasks")
+        if (clean := _clean_title(row["title"])) != row["title"]
+    ]
+    if fixes:
+        with _txn(conn):
+            conn.executemany("UPDATE tasks SET title = ? WHERE id = ?", fixes)
 
 
 def _row_to_task(row: sqlite3.Row) -> Task:
@@ -66,16 +201,21 @@ def _row_to_task(row: sqlite3.Row) -> Task:
         repeat_rule=row["repeat_rule"],
         notion_page_id=row["notion_page_id"],
         status=row["status"],
-        created_at=_to_dt(row["created_at"]) or datetime.utcnow(),
-        updated_at=_to_dt(row["updated_at"]) or datetime.utcnow(),
+        created_at=_to_dt(row["created_at"]) or datetime.now(timezone.utc),
+        updated_at=_to_dt(row["updated_at"]) or datetime.now(timezone.utc),
     )
 
 
+# Bound once: _to_dt runs up to four times per fetched row, and the attribute
+# lookup on datetime is a measurable share of that.
+_fromisoformat = datetime.fromisoformat
+
+
 def _to_dt(value: str | None) -> datetime | None:
     if not value:
         return None
     try:
-        return datetime.fromisoformat(value)
+        return _fromisoformat(value)
     except ValueError:
         return None
 
@@ -84,96 +224,205 @@ def _to_str(value: datetime | None) -> str | None:
     return value.isoformat() if value else None
 
 
+# due_at and remind_at keep their ISO text (with the user's offset) for
+# display, plus an integer Unix-seconds shadow column that range scans
+# compare on; ISO strings only order correctly when offsets agree.
+def _to_ts(value: datetime | None) -> int | None:
+    if not value:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+_INSERT_TASK = """
+    INSERT INTO tasks (
+        user_id, chat_id, title, description, due_at, remind_at,
+        repeat_rule, notion_page_id, status, created_at, updated_at,
+        due_at_ts, remind_at_ts
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _task_params(task: Task) -> tuple:
+    return (
+        task.user_id,
+        task.chat_id,
+        _clean_title(task.title),
+        task.description,
+        _to_str(task.due_at),
+        _to_str(task.remind_at),
+        task.repeat_rule,
+        task.notion_page_id,
+        task.status,
+        _to_str(task.created_at),
+        _to_str(task.updated_at),
+        _to_ts(task.due_at),
+        _to_ts(task.remind_at),
+    )
+
+
 def create_task(db_path: str, task: Task) -> int:
-    with _connect(db_path) as conn:
-        cursor = conn.execute(
-            """
-            INSERT INTO tasks (
-                user_id, chat_id, title, description, due_at, remind_at,
-                repeat_rule, notion_page_id, status, created_at, updated_at
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                task.user_id,
-                task.chat_id,
-                task.title,
-                task.description,
-                _to_str(task.due_at),
-                _to_str(task.remind_at),
-                task.repeat_rule,
-                task.notion_page_id,
-                task.status,
-                _to_str(task.created_at),
-                _to_str(task.updated_at),
-            ),
-        )
-        conn.commit()
-        return int(cursor.lastrowid)
+    conn = _get_conn(db_path)
+    cursor = conn.execute(_INSERT_TASK, _task_params(task))
+    return int(cursor.lastrowid)
+
+
+def create_tasks(db_path: str, tasks: Sequence[Task]) -> list[int]:
+    # The whole batch is one transaction, so it costs a single commit however
+    # many tasks it holds.
+    conn = _get_conn(db_path)
+    with _txn(conn):
+        return [int(conn.execute(_INSERT_TASK, _task_params(task)).lastrowid) for task in tasks]
 
 
 def list_tasks(db_path: str, user_id: int, status: str = "open") -> list[Task]:
-    with _connect(db_path) as conn:
-        rows = conn.execute(
-            """
-            SELECT * FROM tasks
-            WHERE user_id = ? AND status = ?
-            ORDER BY COALESCE(due_at, created_at)
-            """,
-            (user_id, status),
-        ).fetchall()
+    conn = _get_conn(db_path)
+    rows = conn.execute(
+        """
+        SELECT * FROM tasks
+        WHERE user_id = ? AND status = ?
+        ORDER BY COALESCE(due_at, created_at)
+        """,
+        (user_id, status),
+    ).fetchall()
     return [_row_to_task(row) for row in rows]
 
 
 def get_task(db_path: str, task_id: int, user_id: int | None = None) -> Task | None:
-    with _connect(db_path) as conn:
-        if user_id is None:
-            row = conn.execute(
-                "SELECT * FROM tasks WHERE id = ?",
-                (task_id,),
-            ).fetchone()
-        else:
-            row = conn.execute(
-                "SELECT * FROM tasks WHERE id = ? AND user_id = ?",
-                (task_id, user_id),
-            ).fetchone()
-    return _row_to_task(row) if row else None
+    row = _cached_task_row(db_path, task_id)
+    if row is None:
+        generation = _task_cache_generation
+        conn = _get_conn(db_path)
+        row = conn.execute(
+            "SELECT * FROM tasks WHERE id = ?",
+            (task_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        _cache_task_row(db_path, task_id, row, generation)
+    if user_id is not None and row["user_id"] != user_id:
+        return None
+    return _row_to_task(row)
+
+
+# Stays under SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds (999).
+_IN_CHUNK = 900
+
+
+def get_tasks(db_path: str, task_ids: Sequence[int], user_id: int | None = None) -> dict[int, Task]:
+    conn = _get_conn(db_path)
+    ids = list(dict.fromkeys(task_ids))
+    tasks: dict[int, Task] = {}
+    generation = _task_cache_generation
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start : start + _IN_CHUNK]
+        placeholders = ", ".join("?" * len(chunk))
+        for row in conn.execute(f"SELECT * FROM tasks WHERE id IN ({placeholders})", chunk):
+            _cache_task_row(db_path, row["id"], row, generation)
+            if user_id is None or row["user_id"] == user_id:
+                tasks[row["id"]] = _row_to_task(row)
+    return tasks
+
+
+def _cached_task_row(db_path: str, task_id: int) -> sqlite3.Row | None:
+    key = (db_path, task_id)
+    with _task_cache_lock:
+        entry = _task_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, row = entry
+        if expires_at < time.monotonic():
+            del _task_cache[key]
+            return None
+        _task_cache.move_to_end(key)
+        return row
+
+
+def _cache_task_row(db_path: str, task_id: int, row: sqlite3.Row, generation: int) -> None:
+    with _task_cache_lock:
+        if generation != _task_cache_generation:
+            return
+        _task_cache[(db_path, task_id)] = (time.monotonic() + _TASK_CACHE_TTL, row)
+        _task_cache.move_to_end((db_path, task_id))
+        if len(_task_cache) > _TASK_CACHE_SIZE:
+            _task_cache.popitem(last=False)
+
+
+def _invalidate_task(db_path: str, task_id: int) -> None:
+    global _task_cache_generation
+    with _task_cache_lock:
+        _task_cache_generation += 1
+        _task_cache.pop((db_path, task_id), None)
+
+
+def _clear_task_cache() -> None:
+    global _task_cache_generation
+    with _task_cache_lock:
+        _task_cache_generation += 1
+        _task_cache.clear()
+
+
+_UPDATABLE_COLUMNS = frozenset(
+    {
+        "title",
+        "description",
+        "due_at",
+        "remind_at",
+        "repeat_rule",
+        "notion_page_id",
+        "status",
+        "updated_at",
+    }
+)
+
+
+def update_task(db_path: str, task_id: int, **fields: object) -> None:
+    # One UPDATE for any combination of columns; updated_at is stamped by
+    # SQLite unless the caller passes its own.
+    unknown = fields.keys() - _UPDATABLE_COLUMNS
+    if unknown:
+        raise ValueError(f"Unknown task columns: {', '.join(sorted(unknown))}")
+    if "title" in fields:
+        fields["title"] = _clean_title(fields["title"])
+    for column in ("due_at", "remind_at"):
+        if column in fields:
+            fields[f"{column}_ts"] = _to_ts(fields[column])
+    params = [_to_str(value) if isinstance(value, datetime) else value for value in fields.values()]
+    conn = _get_conn(db_path)
+    conn.execute(_update_sql(tuple(fields)), (*params, task_id))
+    _invalidate_task(db_path, task_id)
+
+
+@lru_cache(maxsize=64)
+def _update_sql(columns: tuple[str, ...]) -> str:
+    # Each column combination maps to one SQL string, built once, so sqlite3's
+    # statement cache keeps the prepared UPDATE between calls.
+    assignments = [f"{column} = ?" for column in columns]
+    if "updated_at" not in columns:
+        assignments.append(f"updated_at = {_SQL_NOW}")
+    return f"UPDATE tasks SET {', '.join(assignments)} WHERE id = ?"
 
 
 def update_task_status(
     db_path: str, task_id: int, status: str, updated_at: datetime
 ) -> None:
-    with _connect(db_path) as conn:
-        conn.execute(
-            """
-            UPDATE tasks SET status = ?, updated_at = ?
-            WHERE id = ?
-            """,
-            (status, _to_str(updated_at), task_id),
-        )
-        conn.commit()
+    update_task(db_path, task_id, status=status, updated_at=updated_at)
 
 
 def delete_task(db_path: str, task_id: int, user_id: int) -> bool:
-    with _connect(db_path) as conn:
-        cursor = conn.execute(
-            "DELETE FROM tasks WHERE id = ? AND user_id = ?",
-            (task_id, user_id),
-        )
-        conn.commit()
-        return cursor.rowcount > 0
+    conn = _get_conn(db_path)
+    cursor = conn.execute(
+        "DELETE FROM tasks WHERE id = ? AND user_id = ?",
+        (task_id, user_id),
+    )
+    _invalidate_task(db_path, task_id)
+    return cursor.rowcount > 0
 
 
 def update_task_remind_at(db_path: str, task_id: int, remind_at: datetime) -> None:
-    with _connect(db_path) as conn:
-        conn.execute(
-            """
-            UPDATE tasks SET remind_at = ?, updated_at = ?
-            WHERE id = ?
-            """,
-            (_to_str(remind_at), _to_str(datetime.utcnow()), task_id),
-        )
-        conn.commit()
+    update_task(db_path, task_id, remind_at=remind_at)
 
 
 def update_task_fields(
@@ -184,145 +433,192 @@ def update_task_fields(
     remind_at: datetime | None,
     repeat_rule: str | None,
 ) -> None:
-    with _connect(db_path) as conn:
-        conn.execute(
-            """
-            UPDATE tasks SET due_at = ?, remind_at = ?, repeat_rule = ?, updated_at = ?
-            WHERE id = ?
-            """,
-            (
-                _to_str(due_at),
-                _to_str(remind_at),
-                repeat_rule,
-                _to_str(datetime.utcnow()),
-                task_id,
-            ),
-        )
-        conn.commit()
+    update_task(db_path, task_id, due_at=due_at, remind_at=remind_at, repeat_rule=repeat_rule)
+
+
+def update_task_repeat(
+    db_path: str,
+    task_id: int,
+    *,
+    due_at: datetime | None,
+    remind_at: datetime | None,
+    repeat_rule: str | None,
+    updated_at: datetime,
+) -> None:
+    update_task(
+        db_path,
+        task_id,
+        due_at=due_at,
+        remind_at=remind_at,
+        repeat_rule=repeat_rule,
+        status="open",
+        updated_at=updated_at,
+    )
 
 
 def update_task_notion_id(db_path: str, task_id: int, notion_page_id: str) -> None:
-    with _connect(db_path) as conn:
-        conn.execute(
-            """
-            UPDATE tasks SET notion_page_id = ?, updated_at = ?
-            WHERE id = ?
-            """,
-            (notion_page_id, _to_str(datetime.utcnow()), task_id),
-        )
-        conn.commit()
+    update_task(db_path, task_id, notion_page_id=notion_page_id)
 
 
 def update_task_title(db_path: str, task_id: int, title: str) -> None:
-    with _connect(db_path) as conn:
-        conn.execute(
-            """
-            UPDATE tasks SET title = ?, updated_at = ?
-            WHERE id = ?
-            """,
-            (title, _to_str(datetime.utcnow()), task_id),
-        )
-        conn.commit()
+    update_task(db_path, task_id, title=title)
 
 
 def update_task_due_at(db_path: str, task_id: int, due_at: datetime | None) -> None:
-    with _connect(db_path) as conn:
-        conn.execute(
-            """
-            UPDATE tasks SET due_at = ?, updated_at = ?
-            WHERE id = ?
-            """,
-            (_to_str(due_at), _to_str(datetime.utcnow()), task_id),
-        )
-        conn.commit()
-
-
-def list_future_reminders(db_path: str, now: datetime) -> list[Task]:
-    with _connect(db_path) as conn:
-        rows = conn.execute(
-            """
-            SELECT * FROM tasks
-            WHERE status = 'open' AND remind_at IS NOT NULL AND remind_at > ?
-            """,
-            (_to_str(now),),
-        ).fetchall()
-    return [_row_to_task(row) for row in rows]
+    update_task(db_path, task_id, due_at=due_at)
 
 
-def list_due_tasks(db_path: str, now: datetime) -> Iterable[Task]:
-    with _connect(db_path) as conn:
-        rows = conn.execute(
-            """
-            SELECT * FROM tasks
-            WHERE status = 'open' AND due_at IS NOT NULL AND due_at <= ?
-            """,
-            (_to_str(now),),
-        ).fetchall()
-    return [_row_to_task(row) for row in rows]
+class TaskSummary(NamedTuple):
+    id: int
+    chat_id: int
+    title: str
+    due_at: datetime | None
+    remind_at: datetime | None
+    repeat_rule: str | None
+
+
+# Reminder and due scans only need enough of a task to schedule or announce
+# it, so they skip description, owner and bookkeeping columns.
+_SUMMARY_COLUMNS = "id, chat_id, title, due_at, remind_at, repeat_rule"
+_SQL_FUTURE_REMINDERS = f"""
+    SELECT {_SUMMARY_COLUMNS} FROM tasks
+    WHERE status = 'open' AND remind_at_ts > ?
+"""
+_SQL_DUE_TASKS = f"""
+    SELECT {_SUMMARY_COLUMNS} FROM tasks
+    WHERE status = 'open' AND due_at_ts <= ?
+"""
+
+
+def _row_to_summary(row: sqlite3.Row) -> TaskSummary:
+    return TaskSummary(
+        row["id"],
+        row["chat_id"],
+        row["title"],
+        _to_dt(row["due_at"]),
+        _to_dt(row["remind_at"]),
+        row["repeat_rule"],
+    )
+
+
+def list_future_reminders(db_path: str, now: datetime) -> list[TaskSummary]:
+    conn = _get_conn(db_path)
+    rows = conn.execute(_SQL_FUTURE_REMINDERS, (_to_ts(now),)).fetchall()
+    return [_row_to_summary(row) for row in rows]
+
+
+def list_due_tasks(db_path: str, now: datetime) -> list[TaskSummary]:
+    conn = _get_conn(db_path)
+    rows = conn.execute(_SQL_DUE_TASKS, (_to_ts(now),)).fetchall()
+    return [_row_to_summary(row) for row in rows]
 
 
 def list_tasks_for_chat(db_path: str, chat_id: int, status: str = "open") -> list[Task]:
-    with _connect(db_path) as conn:
-        rows = conn.execute(
-            """
-            SELECT * FROM tasks
-            WHERE chat_id = ? AND status = ?
-            ORDER BY COALESCE(due_at, created_at)
-            """,
-            (chat_id, status),
-        ).fetchall()
+    conn = _get_conn(db_path)
+    rows = conn.execute(
+        """
+        SELECT * FROM tasks
+        WHERE chat_id = ? AND status = ?
+        ORDER BY COALESCE(due_at, created_at)
+        """,
+        (chat_id, status),
+    ).fetchall()
     return [_row_to_task(row) for row in rows]
 
 
+def list_open_tasks_grouped_by_chat(db_path: str) -> dict[int, list[Task]]:
+    conn = _get_conn(db_path)
+    rows = conn.execute(
+        """
+        SELECT * FROM tasks
+        WHERE status = 'open'
+        ORDER BY chat_id, COALESCE(due_at, created_at)
+        """
+    ).fetchall()
+    return {
+        int(chat_id): [_row_to_task(row) for row in chat_rows]
+        for chat_id, chat_rows in groupby(rows, key=lambda row: row["chat_id"])
+    }
+
+
+SUMMARY_OVERDUE, SUMMARY_TODAY, SUMMARY_UPCOMING, SUMMARY_NO_DUE = range(4)
+
+
+def list_tasks_for_summary(db_path: str, today: date) -> dict[int, list[tuple[int, Task]]]:
+    # Buckets follow the SUMMARY_* constants. Comparing the stored date prefix
+    # matches what due_at.date() returns for the parsed value.
+    conn = _get_conn(db_path)
+    today_iso = today.isoformat()
+    rows = conn.execute(
+        """
+        SELECT *,
+            CASE
+                WHEN due_at IS NULL OR due_at = '' THEN 3
+                WHEN substr(due_at, 1, 10) < ? THEN 0
+                WHEN substr(due_at, 1, 10) = ? THEN 1
+                ELSE 2
+            END AS bucket
+        FROM tasks
+        WHERE status = 'open'
+        ORDER BY chat_id, bucket, COALESCE(due_at, created_at)
+        """,
+        (today_iso, today_iso),
+    ).fetchall()
+    return {
+        int(chat_id): [(row["bucket"], _row_to_task(row)) for row in chat_rows]
+        for chat_id, chat_rows in groupby(rows, key=lambda row: row["chat_id"])
+    }
+
+
 def list_chat_ids_with_open_tasks(db_path: str) -> list[int]:
-    with _connect(db_path) as conn:
-        rows = conn.execute(
-            """
-            SELECT DISTINCT chat_id FROM tasks
-            WHERE status = 'open'
-            """
-        ).fetchall()
+    conn = _get_conn(db_path)
+    rows = conn.execute(
+        """
+        SELECT DISTINCT chat_id FROM tasks
+        WHERE status = 'open'
+        """
+    ).fetchall()
     return [int(row["chat_id"]) for row in rows]
 
 
 def list_chat_ids_for_user(db_path: str, user_id: int) -> list[int]:
-    with _connect(db_path) as conn:
-        rows = conn.execute(
-            """
-            SELECT DISTINCT chat_id FROM tasks
-            WHERE status = 'open' AND user_id = ?
-            """,
-            (user_id,),
-        ).fetchall()
+    conn = _get_conn(db_path)
+    rows = conn.execute(
+        """
+        SELECT DISTINCT chat_id FROM tasks
+        WHERE status = 'open' AND user_id = ?
+        """,
+        (user_id,),
+    ).fetchall()
     return [int(row["chat_id"]) for row in rows]
 
 
 def list_tasks_with_notion(db_path: str) -> list[Task]:
-    with _connect(db_path) as conn:
-        rows = conn.execute(
-            """
-            SELECT * FROM tasks
-            WHERE status = 'open' AND notion_page_id IS NOT NULL
-            """
-        ).fetchall()
+    conn = _get_conn(db_path)
+    rows = conn.execute(
+        """
+        SELECT * FROM tasks
+        WHERE status = 'open' AND notion_page_id IS NOT NULL
+        """
+    ).fetchall()
     return [_row_to_task(row) for row in rows]
 
 
 def list_tasks_with_notion_all(db_path: str) -> list[Task]:
-    with _connect(db_path) as conn:
-        rows = conn.execute(
-            """
-            SELECT * FROM tasks
-            WHERE notion_page_id IS NOT NULL
-            """
-        ).fetchall()
+    conn = _get_conn(db_path)
+    rows = conn.execute(
+        """
+        SELECT * FROM tasks
+        WHERE notion_page_id IS NOT NULL
+        """
+    ).fetchall()
     return [_row_to_task(row) for row in rows]
 
 
 def clear_tasks(db_path: str) -> None:
-    with _connect(db_path) as conn:
-        conn.execute("DELETE FROM tasks")
-        conn.commit()
+    conn = _get_conn(db_path)
+    conn.execute("DELETE FROM tasks")
+    _clear_task_cache()
 
 
 def _ensure_column(conn: sqlite3.Connection, table: str, column: str, col_type: str) -> None:
@@ -1,15 +1,162 @@
 from __future__ import annotations
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 import logging
+import threading
+import time
+from typing import Callable, TypeVar
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from .config import Settings
-from .database import Task
+from .database import Task, update_task_notion_id
 
 logger = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
+class _NotionRetry(Retry):
+    # A 429 means Notion did not process the request, so any method can be
+    # repeated; after a 5xx a POST or PATCH may already have created the page
+    # or block, so only idempotent methods are retried.
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if status_code != 429 and method.upper() not in Retry.DEFAULT_ALLOWED_METHODS:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+# One keep-alive session for every Notion call, so the TCP/TLS handshake is
+# paid once rather than per request. Backoff honours Retry-After; read
+# timeouts are not retried since the write may have gone through.
+_session = requests.Session()
+_session.headers.update({"Notion-Version": "2022-06-28", "Content-Type": "application/json"})
+_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=_NotionRetry(
+            total=5,
+            read=0,
+            backoff_factor=0.5,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST", "PATCH"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        ),
+    ),
+)
+
+
+class _TokenBucket:
+    # Thread-safe bucket: a caller takes a token, going negative reserves a
+    # future slot, and the caller sleeps until that slot outside the lock.
+    def __init__(self, rate: float, capacity: float) -> None:
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+# Notion allows an average of three requests per second per integration;
+# pacing below that is cheaper than a 429 plus a retried request.
+_NOTION_BUCKET = _TokenBucket(rate=2.5, capacity=3)
+
+
+_API_URL = "https://api.notion.com/v1/"
+
+
+def _notion_call(
+    settings: Settings, method: str, path: str, *, json_body: dict | None = None, timeout: float = 15
+) -> dict | None:
+    # Every endpoint shares pacing, auth, error logging and decoding; None
+    # means the call failed and has already been logged.
+    _NOTION_BUCKET.acquire()
+    try:
+        response = _session.request(
+            method,
+            _API_URL + path,
+            json=json_body,
+            headers=_bearer_header(settings.notion_token),
+            timeout=timeout,
+        )
+        if response.status_code >= 400:
+            logger.error("Notion API error %s: %s", response.status_code, response.text)
+            return None
+        return response.json()
+    except Exception:
+        logger.exception("Notion API request failed")
+        return None
+
+
+# Notion side effects run in the background so the bot never waits on the
+# API. Each task is pinned to one single-thread worker, keeping its create
+# and archive calls in order; past _MAX_PENDING queued calls new ones are
+# dropped instead of piling up behind an outage.
+_MAX_PENDING = 64
+_WORKERS = 3
+_workers = tuple(
+    ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"notion-{index}")
+    for index in range(_WORKERS)
+)
+_pending = threading.BoundedSemaphore(_MAX_PENDING)
+
+
+def _submit(task_id: int, fn: Callable[..., _T], *args: object) -> Future[_T] | None:
+    if not _pending.acquire(blocking=False):
+        logger.warning("Notion queue is full, skipping %s for task %s", fn.__name__, task_id)
+        return None
+    future = _workers[task_id % _WORKERS].submit(fn, *args)
+    future.add_done_callback(lambda _: _pending.release())
+    return future
+
+
+def submit_task_created(settings: Settings, db_path: str, task: Task) -> Future[str | None] | None:
+    if settings.notion_token and not settings.notion_db_id and settings.notion_page_id:
+        return _submit_append(settings, db_path, task)
+    return _submit(task.id, _create_and_store, settings, db_path, task)
+
+
+def submit_task_archived(settings: Settings, task: Task) -> Future[bool] | None:
+    if not settings.notion_token or not task.notion_page_id:
+        return None
+    archive = archive_page if settings.notion_db_id else archive_block
+    return _submit(task.id, archive, settings, task.notion_page_id)
+
+
+def _create_and_store(settings: Settings, db_path: str, task: Task) -> str | None:
+    notion_id = sync_task_created(settings, task)
+    _store_notion_id(db_path, task, notion_id)
+    return notion_id
+
+
+def _store_notion_id(db_path: str, task: Task, notion_id: str | None) -> None:
+    if notion_id:
+        update_task_notion_id(db_path, task.id, notion_id)
+
+
+@lru_cache(maxsize=8)
+def _bearer_header(token: str) -> dict[str, str]:
+    # requests merges per-call headers into a new dict, so the cached one is
+    # never modified.
+    return {"Authorization": f"Bearer {token}"}
+
+
 def sync_task_created(settings: Settings, task: Task) -> str | None:
     if not settings.notion_token:
         return None
@@ -21,54 +168,33 @@ def sync_task_created(settings: Settings, task: Task) -> str | None:
     else:
         return None
 
-    try:
-        response = requests.post(
-            "https://api.notion.com/v1/pages",
-            json=payload,
-            headers={
-                "Authorization": f"Bearer {settings.notion_token}",
-                "Notion-Version": "2022-06-28",
-                "Content-Type": "application/json",
-            },
-            timeout=15,
-        )
-        if response.status_code >= 400:
-            logger.error(
-                "Notion API error %s: %s",
-                response.status_code,
-                response.text,
-            )
-            return None
-        return response.json().get("id")
-    except Exception:
-        logger.exception("Notion API request failed")
-        return None
+    body = _notion_call(settings, "POST", "pages", json_body=payload)
+    return body.get("id") if body else None
 
 
 def _build_database_payload(settings: Settings, task: Task) -> dict:
-    payload = {
-        "parent": {"database_id": settings.notion_db_id},
-        "properties": {
-            settings.notion_prop_name: {
-                "title": [{"text": {"content": task.title}}]
-            },
-        },
-    }
-    if settings.notion_prop_status and settings.notion_status_value:
-        payload["properties"][settings.notion_prop_status] = {
-            "select": {"name": settings.notion_status_value}
-        }
-    if settings.notion_prop_done:
-        payload["properties"][settings.notion_prop_done] = {"checkbox": False}
+    parent, static_properties = _database_payload_skeleton(settings)
+    properties = dict(static_properties)
+    properties[settings.notion_prop_name] = {"title": [{"text": {"content": task.title}}]}
     if task.due_at and settings.notion_prop_due:
-        payload["properties"][settings.notion_prop_due] = {
-            "date": {"start": task.due_at.isoformat()}
-        }
+        properties[settings.notion_prop_due] = {"date": {"start": task.due_at.isoformat()}}
     if task.repeat_rule and settings.notion_prop_repeat:
-        payload["properties"][settings.notion_prop_repeat] = {
+        properties[settings.notion_prop_repeat] = {
             "rich_text": [{"text": {"content": task.repeat_rule}}]
         }
-    return payload
+    return {"parent": parent, "properties": properties}
+
+
+@lru_cache(maxsize=8)
+def _database_payload_skeleton(settings: Settings) -> tuple[dict, dict]:
+    # The parent and the task-independent properties depend only on settings;
+    # payloads share these nested dicts, which are only ever serialized.
+    properties: dict = {}
+    if settings.notion_prop_status and settings.notion_status_value:
+        properties[settings.notion_prop_status] = {"select": {"name": settings.notion_status_value}}
+    if settings.notion_prop_done:
+        properties[settings.notion_prop_done] = {"checkbox": False}
+    return {"database_id": settings.notion_db_id}, properties
 
 
 def _build_page_children(task: Task) -> list[dict]:
@@ -85,109 +211,105 @@ def _build_page_children(task: Task) -> list[dict]:
 
 
 def get_page(settings: Settings, page_id: str) -> dict | None:
-    try:
-        response = requests.get(
-            f"https://api.notion.com/v1/pages/{page_id}",
-            headers={
-                "Authorization": f"Bearer {settings.notion_token}",
-                "Notion-Version": "2022-06-28",
-                "Content-Type": "application/json",
-            },
-            timeout=15,
-        )
-        if response.status_code >= 400:
-            logger.error("Notion API error %s: %s", response.status_code, response.text)
-            return None
-        return response.json()
-    except Exception:
-        logger.exception("Notion API request failed")
-        return None
+    return _notion_call(settings, "GET", f"pages/{page_id}")
 
 
 def append_to_page(settings: Settings, page_id: str, task: Task) -> str | None:
-    try:
-        response = requests.patch(
-            f"https://api.notion.com/v1/blocks/{page_id}/children",
-            json={"children": _build_page_children(task)},
-            headers={
-                "Authorization": f"Bearer {settings.notion_token}",
-                "Notion-Version": "2022-06-28",
-                "Content-Type": "application/json",
-            },
-            timeout=15,
-        )
-        if response.status_code >= 400:
-            logger.error("Notion API error %s: %s", response.status_code, response.text)
-            return None
-        results = response.json().get("results", [])
-        if results:
-            return results[0].get("id")
-        return None
-    except Exception:
-        logger.exception("Notion API request failed")
+    results = _append_children(settings, page_id, _build_page_children(task))
+    if results:
+        return results[0].get("id")
+    return None
+
+
+def _append_children(settings: Settings, page_id: str, children: list[dict]) -> list[dict] | None:
+    body = _notion_call(settings, "PATCH", f"blocks/{page_id}/children", json_body={"children": children})
+    return body.get("results", []) if body is not None else None
+
+
+# Tasks created in a burst (a pasted list) are appended to the same page in
+# one PATCH. Each buffered task holds a _pending slot like any queued call;
+# the first one opens the window and schedules the flush on its own worker,
+# which sends the batch and stores every block id. An archive needs that
+# stored id, so it still cannot overtake the task's append.
+_APPEND_WINDOW = 0.2
+_APPEND_MAX_CHILDREN = 100
+_append_lock = threading.Lock()
+_append_buffer: dict[tuple[Settings, str], list[tuple[Task, str, Future[str | None]]]] = {}
+_append_opened: dict[tuple[Settings, str], float] = {}
+
+
+def _submit_append(settings: Settings, db_path: str, task: Task) -> Future[str | None] | None:
+    if not _pending.acquire(blocking=False):
+        logger.warning("Notion queue is full, skipping append for task %s", task.id)
         return None
+    future: Future[str | None] = Future()
+    future.add_done_callback(lambda _: _pending.release())
+    key = (settings, settings.notion_page_id)
+    with _append_lock:
+        pending = _append_buffer.setdefault(key, [])
+        pending.append((task, db_path, future))
+        opens_window = len(pending) == 1
+        if opens_window:
+            _append_opened[key] = time.monotonic()
+    if opens_window:
+        _workers[task.id % _WORKERS].submit(_flush_appends, *key)
+    return future
+
+
+def _flush_appends(settings: Settings, page_id: str) -> None:
+    key = (settings, page_id)
+    with _append_lock:
+        opened = _append_opened[key]
+    delay = opened + _APPEND_WINDOW - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+    with _append_lock:
+        pending = _append_buffer.pop(key, [])
+        _append_opened.pop(key, None)
+    batch: list[tuple[Task, str, Future[str | None]]] = []
+    size = 0
+    for entry in pending:
+        children = len(_build_page_children(entry[0]))
+        if batch and size + children > _APPEND_MAX_CHILDREN:
+            _append_batch(settings, page_id, batch)
+            batch, size = [], 0
+        batch.append(entry)
+        size += children
+    if batch:
+        _append_batch(settings, page_id, batch)
+
+
+def _append_batch(
+    settings: Settings, page_id: str, batch: list[tuple[Task, str, Future[str | None]]]
+) -> None:
+    blocks = [_build_page_children(task) for task, _, _ in batch]
+    results = _append_children(settings, page_id, [child for group in blocks for child in group])
+    offset = 0
+    for (task, db_path, future), group in zip(batch, blocks):
+        block = results[offset] if results and offset < len(results) else None
+        notion_id = block.get("id") if block else None
+        offset += len(group)
+        try:
+            _store_notion_id(db_path, task, notion_id)
+        except Exception as exc:
+            logger.exception("Failed to store Notion id for task %s", task.id)
+            future.set_exception(exc)
+        else:
+            future.set_result(notion_id)
 
 
 def get_block(settings: Settings, block_id: str) -> dict | None:
-    try:
-        response = requests.get(
-            f"https://api.notion.com/v1/blocks/{block_id}",
-            headers={
-                "Authorization": f"Bearer {settings.notion_token}",
-                "Notion-Version": "2022-06-28",
-                "Content-Type": "application/json",
-            },
-            timeout=15,
-        )
-        if response.status_code >= 400:
-            logger.error("Notion API error %s: %s", response.status_code, response.text)
-            return None
-        return response.json()
-    except Exception:
-        logger.exception("Notion API request failed")
-        return None
+    return _notion_call(settings, "GET", f"blocks/{block_id}")
 
 
 def archive_page(settings: Settings, page_id: str) -> bool:
-    try:
-        response = requests.patch(
-            f"https://api.notion.com/v1/pages/{page_id}",
-            json={"archived": True},
-            headers={
-                "Authorization": f"Bearer {settings.notion_token}",
-                "Notion-Version": "2022-06-28",
-                "Content-Type": "application/json",
-            },
-            timeout=15,
-        )
-        if response.status_code >= 400:
-            logger.error("Notion API error %s: %s", response.status_code, response.text)
-            return False
-        return True
-    except Exception:
-        logger.exception("Notion API request failed")
-        return False
+    body = _notion_call(settings, "PATCH", f"pages/{page_id}", json_body={"archived": True}, timeout=30)
+    return body is not None
 
 
 def archive_block(settings: Settings, block_id: str) -> bool:
-    try:
-        response = requests.patch(
-            f"https://api.notion.com/v1/blocks/{block_id}",
-            json={"archived": True},
-            headers={
-                "Authorization": f"Bearer {settings.notion_token}",
-                "Notion-Version": "2022-06-28",
-                "Content-Type": "application/json",
-            },
-            timeout=15,
-        )
-        if response.status_code >= 400:
-            logger.error("Notion API error %s: %s", response.status_code, response.text)
-            return False
-        return True
-    except Exception:
-        logger.exception("Notion API request failed")
-        return False
+    body = _notion_call(settings, "PATCH", f"blocks/{block_id}", json_body={"archived": True}, timeout=30)
+    return body is not None
 
 
 def format_date(value: datetime | None) -> str | None:
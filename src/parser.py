@@ -3,20 +3,62 @@ from __future__ import annotations
 import json
 import logging
 import re
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Any
+from datetime import datetime, time, timedelta, tzinfo
+from types import MappingProxyType
+from typing import Any, Iterable
 
 import dateparser
 import requests
 from dateparser.search import search_dates
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from .config import Settings
 
 logger = logging.getLogger(__name__)
 
+_PERPLEXITY_URL = "https://api.perplexity.ai/chat/completions"
 
-@dataclass
+# Shared keep-alive session for Perplexity: task parsing and list cleanup
+# reuse one TLS connection instead of handshaking per message. Completions
+# are not idempotent, so nothing is retried.
+_perplexity_session = requests.Session()
+_perplexity_session.mount(
+    "https://api.perplexity.ai",
+    HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=Retry(total=0)),
+)
+
+
+def request_perplexity(settings: Settings, prompt: str) -> str:
+    response = _perplexity_session.post(
+        _PERPLEXITY_URL,
+        headers={
+            "Authorization": f"Bearer {settings.perplexity_api_key}",
+            "Content-Type": "application/json",
+        },
+        json={
+            "model": "sonar",
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.1,
+        },
+        timeout=20,
+    )
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"]
+
+
+# Options shared by every dateparser call; only the reference time changes.
+_DATEPARSER_BASE = MappingProxyType({"RETURN_AS_TIMEZONE_AWARE": True, "PREFER_DATES_FROM": "future"})
+
+
+def dateparser_settings(now: datetime, tz: tzinfo) -> dict[str, Any]:
+    return {**_DATEPARSER_BASE, "RELATIVE_BASE": now, "TIMEZONE": str(tz)}
+
+
+@dataclass(slots=True, frozen=True)
 class ParsedTask:
     title: str
     description: str | None
@@ -25,6 +67,57 @@ class ParsedTask:
     repeat_rule: str | None
 
 
+def _trie_pattern(words: Iterable[str]) -> str:
+    # Alternation with shared prefixes merged ("по(?:недельник|слезавтра)"),
+    # so the engine commits to one branch per character instead of retrying
+    # every word at each position.
+    tree: dict[str, dict] = {}
+    for word in words:
+        node = tree
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: dict[str, dict]) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if "" in node:
+            return f"(?:{body})?" if len(branches) == 1 else f"{body}?"
+        return body
+
+    return f"(?:{render(tree)})"
+
+
+# Date words and clock times are resolved directly; dateparser is left for
+# free-form phrases that only search_dates understands.
+_DAY_OFFSETS = {"сегодня": 0, "завтра": 1, "послезавтра": 2}
+# Nominative and accusative ("в пятницу"); the other days read the same.
+_WEEKDAYS = {
+    "понедельник": 0,
+    "вторник": 1,
+    "среда": 2,
+    "среду": 2,
+    "четверг": 3,
+    "пятница": 4,
+    "пятницу": 4,
+    "суббота": 5,
+    "субботу": 5,
+    "воскресенье": 6,
+}
+_DAY_PARTS = ("утра", "днем", "вечером", "ночью")
+_REPEAT_KINDS = {
+    "каждый день": "daily",
+    "ежедневно": "daily",
+    "каждую неделю": "weekly",
+    "еженедельно": "weekly",
+    "каждый месяц": "monthly",
+    "ежемесячно": "monthly",
+    "каждый год": "yearly",
+    "ежегодно": "yearly",
+}
+
 _RE_REMIND_OFFSET = re.compile(
     r"напомни(?:ть)?\s+за\s+(\d+)\s*(минут|мин|час|часа|часов|день|дня|дней|неделю|недели|недель)",
     re.IGNORECASE,
@@ -35,28 +128,106 @@ _RE_DURATION_PART = re.compile(
     r"(\d+)\s*(минут|мин|час|часа|часов|день|дня|дней|неделю|недели|недель)",
     re.IGNORECASE,
 )
-_RE_DATE_HINT = re.compile(
-    r"(\b\d{1,2}[.:]\d{2}\b|\b\d{1,2}\b|\bсегодня\b|\bзавтра\b|\bпослезавтра\b|"
-    r"\bпонедельник\b|\bвторник\b|\bсреда\b|\bчетверг\b|\bпятница\b|\bсуббота\b|\bвоскресенье\b|"
-    r"\bутра\b|\bднем\b|\bвечером\b|\bночью\b)",
+# Date words, clock tokens and day parts never overlap, so one finditer
+# pass tokenizes all three; _extract_date_with_time keeps the first of each.
+_RE_DATE_TOKEN = re.compile(
+    r"\b(?:(?P<word>"
+    + _trie_pattern([*_DAY_OFFSETS, *_WEEKDAYS])
+    + r")|(?P<time>\d{1,2}(?:[.:]\d{2})?)|(?P<part>"
+    + _trie_pattern(_DAY_PARTS)
+    + r"))\b",
     re.IGNORECASE,
 )
-_RE_TIME_TOKEN = re.compile(r"\b\d{1,2}([.:]\d{2})?\b")
-_RE_DATE_WORD = re.compile(
-    r"\b(сегодня|завтра|послезавтра|понедельник|вторник|среда|четверг|пятница|суббота|воскресенье)\b",
+# One search finds any fixed repeat phrase; _REPEAT_KINDS names its rule.
+_RE_REPEAT_KIND = re.compile(_trie_pattern(_REPEAT_KINDS), re.IGNORECASE)
+_RE_REPEAT_EVERY = re.compile(r"каждые?\s+(\d+)\s*(день|дня|дней|неделю|недели|недель)", re.IGNORECASE)
+_RE_HAS_TIME = re.compile(r"\d{1,2}[.:]\d{2}|\b(утра|днем|вечером|ночью)\b", re.IGNORECASE)
+_RE_WS = re.compile(r"\s+")
+_RE_CLOCK = re.compile(r"(\d{1,2})(?:[.:](\d{2}))?")
+_RE_TIME_ONLY = re.compile(r"(\d{1,2}(?:[.:]\d{2})?)(?:\s+(утра|днем|вечером|ночью))?", re.IGNORECASE)
+_ONE_DAY = timedelta(days=1)
+# The patterns spell "днем" and use plain spaces; phone keyboards send "днём"
+# and non-breaking spaces, which are folded before matching (titles keep
+# the original spelling).
+_SCAN_TABLE = str.maketrans({"ё": "е", "Ё": "Е", "\u00a0": " ", "\u202f": " "})
+# Everything _cleanup_title strips from a title, in one pass; alternatives
+# keep the order the phrases used to be removed in.
+_RE_TITLE_STRIP = re.compile(
+    "|".join(
+        f"(?:{pattern.pattern})"
+        for pattern in (
+            _RE_REMIND_OFFSET,
+            _RE_REMIND_AT,
+            _RE_REMIND_IN,
+            _RE_REPEAT_KIND,
+            _RE_REPEAT_EVERY,
+        )
+    ),
     re.IGNORECASE,
 )
-_RE_REPEAT_DAILY = re.compile(r"(каждый день|ежедневно)", re.IGNORECASE)
-_RE_REPEAT_WEEKLY = re.compile(r"(каждую неделю|еженедельно)", re.IGNORECASE)
-_RE_REPEAT_MONTHLY = re.compile(r"(каждый месяц|ежемесячно)", re.IGNORECASE)
-_RE_REPEAT_YEARLY = re.compile(r"(каждый год|ежегодно)", re.IGNORECASE)
-_RE_REPEAT_EVERY = re.compile(r"каждые?\s+(\d+)\s*(день|дня|дней|неделю|недели|недель)", re.IGNORECASE)
+
+
+# Substrings any dated or repeating task has to contain: digits, date and
+# day-part words, duration units, month names, repeat and reminder phrases.
+# Stems are loose on purpose; a false hit only costs the full parse, a miss
+# would drop a date.
+_TRIGGERS = (
+    *"0123456789",
+    "напомн",
+    "сегодня",
+    "завтра",
+    "через",
+    "кажд",
+    "еже",
+    "понедельн",
+    "вторн",
+    "сред",
+    "четверг",
+    "пятниц",
+    "суббот",
+    "воскрес",
+    "утр",
+    "днем",
+    "днём",
+    "вечер",
+    "ноч",
+    "полдень",
+    "минут",
+    "час",
+    "недел",
+    "месяц",
+    "год",
+    "выходн",
+    "январ",
+    "феврал",
+    "март",
+    "апрел",
+    "мая",
+    "май",
+    "июн",
+    "июл",
+    "август",
+    "сентябр",
+    "октябр",
+    "ноябр",
+    "декабр",
+)
 
 
 def parse_task_text(text: str, now: datetime, settings: Settings) -> ParsedTask:
     text = text.strip()
+    lower = text.lower()
+    if not any(trigger in lower for trigger in _TRIGGERS):
+        # "купить молока": nothing to date, skip the LLM and dateparser.
+        return ParsedTask(
+            title=_cleanup_title(text),
+            description=None,
+            due_at=None,
+            remind_at=None,
+            repeat_rule=None,
+        )
     if settings.perplexity_api_key:
-        parsed = _parse_with_perplexity(text, now, settings)
+        parsed = _parse_with_perplexity_cached(text, now, settings)
         if parsed:
             logger.info("Perplexity parse success")
             return _sanitize_parsed_task(parsed, now)
@@ -64,6 +235,44 @@ def parse_task_text(text: str, now: datetime, settings: Settings) -> ParsedTask:
     return _sanitize_parsed_task(_parse_fallback(text, now, settings), now)
 
 
+# Repeated messages ("отчет каждую неделю 18:00") skip the LLM round trip.
+# The key rounds "now" to the hour, but an answer can depend on the minute:
+# a bare "напомни в 12:30" means the nearest future 12:30, so an entry whose
+# dates have already passed is treated as a miss and asked again.
+# Offsets from "now" ("через 2 часа", "спустя час", "в течение часа",
+# "полчаса") are relative to the exact minute and are never cached.
+# ParsedTask is frozen, so hits share the entry.
+_PPLX_CACHE_SIZE = 2048
+_pplx_cache: OrderedDict[tuple[str, str, str], ParsedTask] = OrderedDict()
+_pplx_cache_lock = threading.Lock()
+_RE_RELATIVE = re.compile(r"\b(?:через|спустя|в\s+течение)\b|\bполчас", re.IGNORECASE)
+
+
+def _parse_with_perplexity_cached(
+    text: str, now: datetime, settings: Settings
+) -> ParsedTask | None:
+    if _RE_RELATIVE.search(text):
+        return _parse_with_perplexity(text, now, settings)
+    key = (text, now.replace(minute=0, second=0, microsecond=0).isoformat(), str(settings.tz))
+    with _pplx_cache_lock:
+        cached = _pplx_cache.get(key)
+        if cached is not None:
+            _pplx_cache.move_to_end(key)
+    if cached is not None and not _has_passed(cached, now):
+        return cached
+    parsed = _parse_with_perplexity(text, now, settings)
+    if parsed is not None:
+        with _pplx_cache_lock:
+            _pplx_cache[key] = parsed
+            if len(_pplx_cache) > _PPLX_CACHE_SIZE:
+                _pplx_cache.popitem(last=False)
+    return parsed
+
+
+def _has_passed(parsed: ParsedTask, now: datetime) -> bool:
+    return any(value is not None and value <= now for value in (parsed.due_at, parsed.remind_at))
+
+
 def _parse_with_perplexity(text: str, now: datetime, settings: Settings) -> ParsedTask | None:
     prompt = (
         "Ты — парсер задач для Telegram-бота. Твоя цель — понять смысл задачи и вернуть ТОЛЬКО JSON.\n"
@@ -90,25 +299,8 @@ def _parse_with_perplexity(text: str, now: datetime, settings: Settings) -> Pars
         "JSON:"
     )
 
-    headers = {
-        "Authorization": f"Bearer {settings.perplexity_api_key}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "model": "sonar",
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.1,
-    }
-
     try:
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=20,
-        )
-        response.raise_for_status()
-        content = response.json()["choices"][0]["message"]["content"]
+        content = request_perplexity(settings, prompt)
         data = _safe_json_loads(content)
         if data is None:
             logger.warning("Perplexity returned non-JSON: %r", content[:500])
@@ -131,13 +323,14 @@ def _parse_with_perplexity(text: str, now: datetime, settings: Settings) -> Pars
 
 
 def _parse_fallback(text: str, now: datetime, settings: Settings) -> ParsedTask:
-    due_at = _extract_due_date(text, now, settings)
-    remind_at = _extract_remind_at(text, now, settings, due_at)
+    scan = text.translate(_SCAN_TABLE)
+    due_at = _extract_due_date(scan, now, settings)
+    remind_at = _extract_remind_at(scan, now, settings, due_at)
     if remind_at and not due_at:
         due_at = remind_at
-    if not remind_at and due_at and "напомни" in text.lower():
+    if not remind_at and due_at and "напомни" in scan.lower():
         remind_at = due_at
-    repeat_rule = _extract_repeat_rule(text)
+    repeat_rule = _extract_repeat_rule(scan)
     title = _cleanup_title(text)
 
     return ParsedTask(
@@ -150,27 +343,20 @@ def _parse_fallback(text: str, now: datetime, settings: Settings) -> ParsedTask:
 
 
 def _extract_due_date(text: str, now: datetime, settings: Settings) -> datetime | None:
-    combined = _extract_date_with_time(text, now, settings)
+    combined = _extract_date_with_time(text, now)
     if combined:
         return combined
     matches = search_dates(
         text,
         languages=["ru"],
-        settings={
-            "RELATIVE_BASE": now,
-            "TIMEZONE": str(settings.tz),
-            "RETURN_AS_TIMEZONE_AWARE": True,
-            "PREFER_DATES_FROM": "future",
-        },
+        settings=dateparser_settings(now, settings.tz),
     )
     if matches:
         candidates = []
         for matched_text, dt in matches:
             if dt <= now:
                 continue
-            has_time = bool(
-                re.search(r"\d{1,2}[.:]\d{2}|\b(утра|днем|вечером|ночью)\b", matched_text, re.IGNORECASE)
-            )
+            has_time = bool(_RE_HAS_TIME.search(matched_text))
             candidates.append((has_time, dt))
         if candidates:
             candidates.sort(key=lambda item: (not item[0], item[1]))
@@ -178,52 +364,59 @@ def _extract_due_date(text: str, now: datetime, settings: Settings) -> datetime
     return None
 
 
-def _extract_date_with_time(text: str, now: datetime, settings: Settings) -> datetime | None:
-    if not _RE_DATE_HINT.search(text):
-        return None
-    date_word_match = _RE_DATE_WORD.search(text)
-    if not date_word_match:
+def _extract_date_with_time(text: str, now: datetime) -> datetime | None:
+    found: dict[str, str] = {}
+    for match in _RE_DATE_TOKEN.finditer(text):
+        found.setdefault(match.lastgroup, match.group(0))
+        if len(found) == 3:
+            break
+    date_word = found.get("word")
+    time_token = found.get("time")
+    if not date_word or not time_token:
         return None
-    time_match = _RE_TIME_TOKEN.search(text)
-    if not time_match and not re.search(r"\b(утра|днем|вечером|ночью)\b", text, re.IGNORECASE):
+    clock = _clock_time(time_token, found.get("part"))
+    if not clock:
         return None
-    date_part = dateparser.parse(
-        date_word_match.group(0),
-        languages=["ru"],
-        settings={
-            "RELATIVE_BASE": now,
-            "TIMEZONE": str(settings.tz),
-            "RETURN_AS_TIMEZONE_AWARE": True,
-            "PREFER_DATES_FROM": "future",
-        },
-    )
-    if not date_part:
+    day = now.date() + timedelta(days=_date_word_offset(date_word, now))
+    return datetime.combine(day, time(*clock), tzinfo=now.tzinfo)
+
+
+def _date_word_offset(word: str, now: datetime) -> int:
+    word = word.lower()
+    if word in _DAY_OFFSETS:
+        return _DAY_OFFSETS[word]
+    # Like dateparser with PREFER_DATES_FROM=future: today's weekday means
+    # the same day next week.
+    return (_WEEKDAYS[word] - now.weekday() - 1) % 7 + 1
+
+
+def _clock_time(token: str, day_part: str | None) -> tuple[int, int] | None:
+    match = _RE_CLOCK.fullmatch(token)
+    if not match:
         return None
-    time_text = time_match.group(0) if time_match else "00:00"
-    suffix_match = re.search(r"\b(утра|днем|вечером|ночью)\b", text, re.IGNORECASE)
-    if suffix_match:
-        time_text = f"{time_text} {suffix_match.group(0)}"
-    time_part = dateparser.parse(
-        time_text,
-        languages=["ru"],
-        settings={
-            "RELATIVE_BASE": now,
-            "TIMEZONE": str(settings.tz),
-            "RETURN_AS_TIMEZONE_AWARE": True,
-            "PREFER_DATES_FROM": "future",
-        },
-    )
-    if not time_part:
+    if match.group(2) is None and day_part is None:
+        # A bare number ("2 молока") is not a time without "утра"/"вечером".
         return None
-    try:
-        return date_part.replace(
-            hour=time_part.hour,
-            minute=time_part.minute,
-            second=0,
-            microsecond=0,
-        )
-    except ValueError:
+    hour = int(match.group(1))
+    minute = int(match.group(2) or 0)
+    if day_part:
+        hour = _apply_day_part(hour, day_part.lower())
+    if hour > 23 or minute > 59:
         return None
+    return hour, minute
+
+
+def _apply_day_part(hour: int, day_part: str) -> int:
+    if day_part == "утра":
+        return 0 if hour == 12 else hour
+    if day_part == "днем":
+        return hour + 12 if 1 <= hour <= 6 else hour
+    if day_part == "вечером":
+        return hour + 12 if 1 <= hour <= 11 else hour
+    # ночью
+    if hour == 12:
+        return 0
+    return hour + 12 if 8 <= hour <= 11 else hour
 
 
 def _extract_remind_at(
@@ -247,39 +440,34 @@ def _extract_remind_at(
 
     at_match = _RE_REMIND_AT.search(text)
     if at_match:
+        time_only = _RE_TIME_ONLY.fullmatch(at_match.group(1).strip())
+        clock = time_only and _clock_time(time_only.group(1), time_only.group(2))
+        if clock:
+            # "напомни в 9:00" with no date: the next time the clock shows it.
+            remind_at = datetime.combine(now.date(), time(*clock), tzinfo=now.tzinfo)
+            return remind_at if remind_at > now else remind_at + _ONE_DAY
         parsed = dateparser.parse(
             at_match.group(1),
             languages=["ru"],
-            settings={
-                "RELATIVE_BASE": now,
-                "TIMEZONE": str(settings.tz),
-                "RETURN_AS_TIMEZONE_AWARE": True,
-                "PREFER_DATES_FROM": "future",
-            },
+            settings=dateparser_settings(now, settings.tz),
         )
         return parsed if parsed and parsed > now else None
     return None
 
 
+# Every unit word the duration patterns accept, keyed by its first three
+# letters ("часов" -> "час", "дней" -> "дне"); anything else counts days.
+_UNIT_SECONDS = {"мин": 60, "час": 3600, "ден": 86400, "дня": 86400, "дне": 86400, "нед": 604800}
+
+
 def _to_delta(amount: int, unit: str) -> timedelta:
-    if unit.startswith("мин"):
-        return timedelta(minutes=amount)
-    if unit.startswith("час"):
-        return timedelta(hours=amount)
-    if unit.startswith("нед"):
-        return timedelta(weeks=amount)
-    return timedelta(days=amount)
+    return timedelta(seconds=amount * _UNIT_SECONDS.get(unit[:3], 86400))
 
 
 def _extract_repeat_rule(text: str) -> str | None:
-    if _RE_REPEAT_DAILY.search(text):
-        return "daily"
-    if _RE_REPEAT_WEEKLY.search(text):
-        return "weekly"
-    if _RE_REPEAT_MONTHLY.search(text):
-        return "monthly"
-    if _RE_REPEAT_YEARLY.search(text):
-        return "yearly"
+    kind_match = _RE_REPEAT_KIND.search(text)
+    if kind_match:
+        return _REPEAT_KINDS[kind_match.group(0).lower()]
 
     match = _RE_REPEAT_EVERY.search(text)
     if match:
@@ -292,16 +480,9 @@ def _extract_repeat_rule(text: str) -> str | None:
 
 
 def _cleanup_title(text: str) -> str:
-    text = re.sub(r"\s+", " ", text).strip()
-    text = _RE_REMIND_OFFSET.sub("", text)
-    text = _RE_REMIND_AT.sub("", text)
-    text = _RE_REMIND_IN.sub("", text)
-    text = _RE_REPEAT_DAILY.sub("", text)
-    text = _RE_REPEAT_WEEKLY.sub("", text)
-    text = _RE_REPEAT_MONTHLY.sub("", text)
-    text = _RE_REPEAT_YEARLY.sub("", text)
-    text = _RE_REPEAT_EVERY.sub("", text)
-    return re.sub(r"\s+", " ", text).strip() or "Без названия"
+    text = _RE_WS.sub(" ", text).strip()
+    text = _RE_TITLE_STRIP.sub("", text)
+    return _RE_WS.sub(" ", text).strip() or "Без названия"
 
 
 def _parse_dt(value: Any, tz) -> datetime | None:
@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+from calendar import monthrange
 from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .parser import ParsedTask
 
 
 def format_dt(dt: datetime | None, fmt: str = "%d.%m %H:%M") -> str:
@@ -12,24 +17,83 @@ def format_dt(dt: datetime | None, fmt: str = "%d.%m %H:%M") -> str:
 def next_due_date(due_at: datetime | None, repeat_rule: str | None) -> datetime | None:
     if not due_at or not repeat_rule:
         return None
+    step = _repeat_step(repeat_rule)
+    if isinstance(step, int):
+        return _add_months(due_at, step)
+    if step is not None:
+        return due_at + step
+    return None
+
+
+def next_due_after(
+    due_at: datetime | None, repeat_rule: str | None, now: datetime
+) -> datetime | None:
+    # First occurrence strictly after now, computed directly instead of
+    # stepping one period at a time from a date that may be months old.
+    if not due_at or not repeat_rule:
+        return None
+    if due_at > now:
+        return due_at
+    step = _repeat_step(repeat_rule)
+    if not step:
+        return None
+    if isinstance(step, timedelta):
+        return due_at + ((now - due_at) // step + 1) * step
+    # Months are counted from due_at itself so a 31st stays on the 31st
+    # wherever the month allows; the estimate is at most one step short.
+    count = ((now.year - due_at.year) * 12 + now.month - due_at.month) // step
+    candidate = _add_months(due_at, count * step)
+    while candidate <= now:
+        count += 1
+        candidate = _add_months(due_at, count * step)
+    return candidate
+
+
+def normalize_parsed_dates(
+    parsed: ParsedTask, now: datetime
+) -> tuple[datetime | None, datetime | None]:
+    due_at = parsed.due_at
+    remind_at = parsed.remind_at
+    if due_at and parsed.repeat_rule and due_at <= now:
+        candidate = next_due_after(due_at, parsed.repeat_rule, now)
+        if candidate:
+            if remind_at and remind_at < due_at:
+                offset = due_at - remind_at
+                candidate_remind = candidate - offset
+                remind_at = candidate_remind if candidate_remind > now else None
+            due_at = candidate
+    if remind_at and remind_at <= now:
+        remind_at = None
+    if remind_at and not due_at:
+        due_at = remind_at
+    return due_at, remind_at
+
+
+_ONE_DAY = timedelta(days=1)
+_ONE_WEEK = timedelta(weeks=1)
+# A fixed period, or a number of calendar months.
+_REPEAT_STEPS: dict[str, timedelta | int] = {
+    "daily": _ONE_DAY,
+    "weekly": _ONE_WEEK,
+    "monthly": 1,
+    "yearly": 12,
+}
+
+
+def _repeat_step(repeat_rule: str) -> timedelta | int | None:
     rule = repeat_rule.lower().strip()
-    if rule == "daily":
-        return due_at + timedelta(days=1)
-    if rule == "weekly":
-        return due_at + timedelta(weeks=1)
-    if rule == "monthly":
-        return _add_months(due_at, 1)
-    if rule == "yearly":
-        return _add_months(due_at, 12)
+    step = _REPEAT_STEPS.get(rule)
+    if step is not None:
+        return step
     if rule.startswith("every "):
         parts = rule.split()
         if len(parts) >= 3 and parts[1].isdigit():
             amount = int(parts[1])
             unit = parts[2]
             if unit.startswith("week"):
-                return due_at + timedelta(weeks=amount)
+                return timedelta(weeks=amount)
             if unit.startswith("day"):
-                return due_at + timedelta(days=amount)
+                return timedelta(days=amount)
     return None
 
 
@@ -41,8 +105,4 @@ def _add_months(dt: datetime, months: int) -> datetime:
 
 
 def _days_in_month(year: int, month: int) -> int:
-    if month == 12:
-        next_month = datetime(year + 1, 1, 1)
-    else:
-        next_month = datetime(year, month + 1, 1)
-    return (next_month - timedelta(days=1)).day
+    return monthrange(year, month)[1]
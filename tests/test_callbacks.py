@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.bot import _SendLimiter, done_callback
+from src.database import init_db
+
+
+class _Query:
+    def __init__(self, data: str) -> None:
+        self.data = data
+        self.message = None
+        self.answers: list[tuple[str, bool]] = []
+
+    async def answer(self, text: str, show_alert: bool = False) -> None:
+        self.answers.append((text, show_alert))
+
+
+def _run(data: str, db_path: str) -> _Query:
+    query = _Query(data)
+    update = SimpleNamespace(callback_query=query, effective_user=SimpleNamespace(id=1), effective_chat=None)
+    context = SimpleNamespace(bot_data={"allowed_ids": {1}, "db_path": db_path, "settings": None})
+    asyncio.run(done_callback(update, context))
+    return query
+
+
+def test_callback_alerts_are_the_only_answer(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+
+    assert _run("done:abc", db_path).answers == [("Некорректный id", True)]
+    assert _run("done:404", db_path).answers == [("Задача не найдена", True)]
+    assert _run("unknown:1", db_path).answers == [("Ок", False)]
+
+
+def test_send_limiter_forgets_chats_whose_interval_has_passed(monkeypatch):
+    monkeypatch.setattr("src.bot._SEND_RATE", 1000)
+    monkeypatch.setattr("src.bot._SEND_CHAT_INTERVAL", 0.05)
+
+    async def scenario() -> dict[int, float]:
+        limiter = _SendLimiter()
+        for chat_id in range(20):
+            await limiter.wait(chat_id)
+        await asyncio.sleep(0.1)
+        await limiter.wait(99)
+        return limiter._next_chat_slot
+
+    assert list(asyncio.run(scenario())) == [99]
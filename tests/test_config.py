@@ -0,0 +1,16 @@
+from src.config import load_settings, reset_settings_cache
+
+
+def test_load_settings_is_cached_until_reset(monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "token")
+    monkeypatch.setenv("ALLOWED_USER_IDS", "1, 2,x")
+    reset_settings_cache()
+    settings = load_settings()
+    assert settings.allowed_user_ids == frozenset({1, 2})
+
+    monkeypatch.setenv("ALLOWED_USER_IDS", "3")
+    assert load_settings() is settings
+
+    reset_settings_cache()
+    assert load_settings().allowed_user_ids == frozenset({3})
+    reset_settings_cache()
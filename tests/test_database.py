@@ -0,0 +1,327 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src import database
+from src.database import (
+    SUMMARY_NO_DUE,
+    SUMMARY_OVERDUE,
+    SUMMARY_TODAY,
+    SUMMARY_UPCOMING,
+    Task,
+    create_task,
+    create_tasks,
+    delete_task,
+    get_task,
+    get_tasks,
+    init_db,
+    list_future_reminders,
+    list_open_tasks_grouped_by_chat,
+    list_tasks,
+    list_tasks_for_summary,
+    transaction,
+    update_task,
+    update_task_fields,
+    update_task_repeat,
+    update_task_status,
+    update_task_title,
+)
+
+
+def _make_task(
+    user_id: int, chat_id: int, title: str, due_at: datetime | None = None
+) -> Task:
+    now = datetime.utcnow()
+    return Task(
+        id=None,
+        user_id=user_id,
+        chat_id=chat_id,
+        title=title,
+        description=None,
+        due_at=due_at,
+        remind_at=None,
+        repeat_rule=None,
+        notion_page_id=None,
+        status="open",
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def test_open_tasks_grouped_by_chat(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+
+    now = datetime.utcnow()
+    create_task(db_path, _make_task(1, 100, "later", now + timedelta(days=2)))
+    create_task(db_path, _make_task(1, 100, "sooner", now + timedelta(days=1)))
+    create_task(db_path, _make_task(2, 200, "other chat"))
+    done_id = create_task(db_path, _make_task(1, 100, "done"))
+    update_task_status(db_path, done_id, "done", now)
+
+    grouped = list_open_tasks_grouped_by_chat(db_path)
+
+    assert sorted(grouped) == [100, 200]
+    assert [task.title for task in grouped[100]] == ["sooner", "later"]
+    assert [task.title for task in grouped[200]] == ["other chat"]
+
+
+def test_get_task_sees_writes_and_checks_owner(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+
+    task_id = create_task(db_path, _make_task(1, 100, "old title"))
+    assert get_task(db_path, task_id, 1).title == "old title"
+    assert get_task(db_path, task_id, 2) is None
+
+    update_task_title(db_path, task_id, "new title")
+    assert get_task(db_path, task_id, 1).title == "new title"
+
+    delete_task(db_path, task_id, 1)
+    assert get_task(db_path, task_id) is None
+
+
+def test_get_task_does_not_cache_a_row_read_before_a_write(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    task_id = create_task(db_path, _make_task(1, 100, "old title"))
+    fill = database._cache_task_row
+
+    def fill_after_write(*args):
+        # The SELECT has run; another thread writes before the row is cached.
+        writer = threading.Thread(target=update_task_title, args=(db_path, task_id, "new title"))
+        writer.start()
+        writer.join()
+        fill(*args)
+
+    monkeypatch.setattr(database, "_cache_task_row", fill_after_write)
+    assert get_task(db_path, task_id).title == "old title"
+    monkeypatch.setattr(database, "_cache_task_row", fill)
+
+    assert get_task(db_path, task_id).title == "new title"
+
+
+def test_update_task_repeat_reopens_with_new_dates(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+
+    now = datetime.utcnow()
+    task_id = create_task(db_path, _make_task(1, 100, "repeat", now))
+    update_task_status(db_path, task_id, "done", now)
+
+    next_due = now + timedelta(days=1)
+    update_task_repeat(
+        db_path,
+        task_id,
+        due_at=next_due,
+        remind_at=next_due - timedelta(hours=1),
+        repeat_rule="daily",
+        updated_at=now,
+    )
+
+    task = get_task(db_path, task_id)
+    assert task.status == "open"
+    assert task.due_at == next_due
+    assert task.remind_at == next_due - timedelta(hours=1)
+
+
+def test_tasks_for_summary_are_bucketed_by_due_date(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+
+    today = datetime(2026, 2, 1, 12, 0)
+    create_task(db_path, _make_task(1, 100, "no due"))
+    create_task(db_path, _make_task(1, 100, "upcoming", today + timedelta(days=3)))
+    create_task(db_path, _make_task(1, 100, "today", today.replace(hour=18)))
+    create_task(db_path, _make_task(1, 100, "overdue", today - timedelta(days=1)))
+
+    grouped = list_tasks_for_summary(db_path, today.date())
+
+    assert [(bucket, task.title) for bucket, task in grouped[100]] == [
+        (SUMMARY_OVERDUE, "overdue"),
+        (SUMMARY_TODAY, "today"),
+        (SUMMARY_UPCOMING, "upcoming"),
+        (SUMMARY_NO_DUE, "no due"),
+    ]
+
+
+def test_updates_stamp_updated_at(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    task_id = create_task(db_path, _make_task(1, 10, "a"))
+
+    update_task_title(db_path, task_id, "b")
+
+    task = get_task(db_path, task_id)
+    assert task.title == "b"
+    assert abs(task.updated_at - datetime.now(timezone.utc)) < timedelta(minutes=1)
+
+
+def test_titles_are_stored_normalized(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    task_id = create_task(db_path, _make_task(1, 10, "  купить\n\tхлеб  "))
+    assert get_task(db_path, task_id).title == "купить хлеб"
+
+    update_task_title(db_path, task_id, "купить   молоко ")
+    assert get_task(db_path, task_id).title == "купить молоко"
+
+
+def test_init_db_normalizes_existing_titles(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    task_id = create_task(db_path, _make_task(1, 10, "a"))
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE tasks SET title = ? WHERE id = ?", ("a \n b", task_id))
+    conn.commit()
+    conn.close()
+
+    init_db(db_path)
+
+    conn = sqlite3.connect(db_path)
+    (title,) = conn.execute("SELECT title FROM tasks WHERE id = ?", (task_id,)).fetchone()
+    conn.close()
+    assert title == "a b"
+
+
+def test_update_task_sets_several_columns_at_once(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    task_id = create_task(db_path, _make_task(1, 10, "a"))
+    due = datetime(2030, 1, 2, 9, 0)
+
+    update_task(db_path, task_id, due_at=due, repeat_rule="daily", status="done")
+
+    task = get_task(db_path, task_id)
+    assert (task.due_at, task.repeat_rule, task.status) == (due, "daily", "done")
+    with pytest.raises(ValueError):
+        update_task(db_path, task_id, user_id=2)
+
+
+def test_create_tasks_inserts_batch_in_order(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+
+    task_ids = create_tasks(db_path, [_make_task(1, 10, f"t{i}") for i in range(3)])
+
+    assert len(set(task_ids)) == 3
+    assert [get_task(db_path, task_id).title for task_id in task_ids] == ["t0", "t1", "t2"]
+    assert len(list_tasks(db_path, 1)) == 3
+    assert create_tasks(db_path, []) == []
+
+
+def test_get_tasks_loads_many_ids_at_once(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.database._IN_CHUNK", 2)
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    mine = create_tasks(db_path, [_make_task(1, 10, f"t{i}") for i in range(3)])
+    other = create_task(db_path, _make_task(2, 20, "other"))
+
+    tasks = get_tasks(db_path, [*mine, other, 999], user_id=1)
+
+    assert sorted(tasks) == sorted(mine)
+    assert tasks[mine[2]].title == "t2"
+    assert set(get_tasks(db_path, [other, mine[0]])) == {other, mine[0]}
+
+
+def test_get_tasks_does_not_cache_rows_read_before_a_write(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    first, second = create_tasks(db_path, [_make_task(1, 10, "a"), _make_task(1, 10, "b")])
+    fill = database._cache_task_row
+    wrote = []
+
+    def fill_after_write(*args):
+        if not wrote:
+            writer = threading.Thread(target=delete_task, args=(db_path, second, 1))
+            writer.start()
+            writer.join()
+            wrote.append(second)
+        fill(*args)
+
+    monkeypatch.setattr(database, "_cache_task_row", fill_after_write)
+    assert set(get_tasks(db_path, [first, second])) == {first, second}
+    monkeypatch.setattr(database, "_cache_task_row", fill)
+
+    assert get_task(db_path, second) is None
+    assert get_task(db_path, first).title == "a"
+
+
+def test_future_reminders_carry_scheduling_fields(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    now = datetime(2030, 1, 1, 12, 0)
+    task = _make_task(1, 10, "call")
+    task.remind_at = now + timedelta(hours=1)
+    task_id = create_task(db_path, task)
+    past = _make_task(1, 10, "old")
+    past.remind_at = now - timedelta(hours=1)
+    create_task(db_path, past)
+
+    (reminder,) = list_future_reminders(db_path, now)
+
+    assert (reminder.id, reminder.chat_id, reminder.remind_at) == (task_id, 10, task.remind_at)
+
+
+def test_transaction_groups_writes_and_rolls_back(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    task_id = create_task(db_path, _make_task(1, 10, "a"))
+
+    with pytest.raises(RuntimeError):
+        with transaction(db_path):
+            update_task_title(db_path, task_id, "b")
+            create_tasks(db_path, [_make_task(1, 10, "c")])
+            assert get_task(db_path, task_id).title == "b"
+            raise RuntimeError
+
+    assert get_task(db_path, task_id).title == "a"
+    assert len(list_tasks(db_path, 1)) == 1
+
+    with transaction(db_path):
+        update_task_title(db_path, task_id, "b")
+        update_task_status(db_path, task_id, "done", datetime.utcnow())
+    assert get_task(db_path, task_id).status == "done"
+
+
+def test_future_reminders_compare_instants_across_offsets(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    msk = timezone(timedelta(hours=3))
+    now = datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc)
+    task = _make_task(1, 10, "call")
+    # 14:30 MSK is 11:30 UTC: earlier than now, though its ISO text sorts later.
+    task.remind_at = datetime(2030, 1, 1, 14, 30, tzinfo=msk)
+    task_id = create_task(db_path, task)
+    assert list_future_reminders(db_path, now) == []
+
+    update_task_fields(
+        db_path,
+        task_id,
+        due_at=None,
+        remind_at=datetime(2030, 1, 1, 15, 30, tzinfo=msk),
+        repeat_rule=None,
+    )
+    assert [reminder.id for reminder in list_future_reminders(db_path, now)] == [task_id]
+
+
+def test_updated_at_reads_back_aware_from_every_writer(tmp_path):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    task_id = create_task(db_path, _make_task(1, 10, "a"))
+    local_now = datetime.now(timezone(timedelta(hours=3)))
+
+    update_task_status(db_path, task_id, "done", local_now)
+    assert get_task(db_path, task_id).updated_at == local_now
+    update_task_title(db_path, task_id, "b")
+    assert get_task(db_path, task_id).updated_at.utcoffset() == timedelta(0)
+
+    legacy_id = create_task(db_path, _make_task(1, 10, "legacy"))
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE tasks SET updated_at = '2026-02-01T09:00:00.000' WHERE id = ?", (legacy_id,))
+    conn.commit()
+    conn.close()
+    init_db(db_path)
+    assert get_task(db_path, legacy_id).updated_at == datetime(2026, 2, 1, 9, 0, tzinfo=timezone.utc)
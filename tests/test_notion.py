@@ -0,0 +1,138 @@
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from src import notion
+from src.database import Task, create_task, get_task, init_db
+
+
+@dataclass(frozen=True)
+class _NotionSettings:
+    notion_token: str = "token"
+    notion_db_id: str | None = None
+    notion_page_id: str | None = "page"
+
+
+def _make_task(title: str) -> Task:
+    now = datetime.now(timezone.utc)
+    return Task(
+        id=None,
+        user_id=1,
+        chat_id=10,
+        title=title,
+        description=None,
+        due_at=None,
+        remind_at=None,
+        repeat_rule=None,
+        notion_page_id=None,
+        status="open",
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def _create(db_path: str, titles: list[str]) -> list[Task]:
+    tasks = []
+    for title in titles:
+        task = _make_task(title)
+        task.id = create_task(db_path, task)
+        tasks.append(task)
+    return tasks
+
+
+def _fake_append(calls: list[int]):
+    def append(settings, page_id, children):
+        calls.append(len(children))
+        return [{"id": f"block-{len(calls)}-{index}"} for index in range(len(children))]
+
+    return append
+
+
+def test_page_appends_are_batched_and_mapped_by_offset(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    calls: list[int] = []
+    monkeypatch.setattr(notion, "_append_children", _fake_append(calls))
+    # "two" contributes two blocks, so later tasks start one offset further.
+    monkeypatch.setattr(
+        notion,
+        "_build_page_children",
+        lambda task: [{"title": task.title}] * (2 if task.title == "two" else 1),
+    )
+    tasks = _create(db_path, ["one", "two", "three"])
+
+    futures = [notion.submit_task_created(_NotionSettings(), db_path, task) for task in tasks]
+
+    assert [future.result(timeout=5) for future in futures] == ["block-1-0", "block-1-1", "block-1-3"]
+    assert calls == [4]
+    assert [get_task(db_path, task.id).notion_page_id for task in tasks] == [
+        "block-1-0",
+        "block-1-1",
+        "block-1-3",
+    ]
+
+
+def test_page_appends_split_at_the_children_limit(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    calls: list[int] = []
+    monkeypatch.setattr(notion, "_append_children", _fake_append(calls))
+    monkeypatch.setattr(notion, "_pending", threading.BoundedSemaphore(200))
+    monkeypatch.setattr(notion, "_APPEND_WINDOW", 1.0)
+    tasks = _create(db_path, [f"t{index}" for index in range(150)])
+
+    futures = [notion.submit_task_created(_NotionSettings(), db_path, task) for task in tasks]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert calls == [100, 50]
+    assert results[99] == "block-1-99"
+    assert results[100] == "block-2-0"
+
+
+def test_submit_drops_work_when_the_queue_is_full(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "tasks.db")
+    init_db(db_path)
+    monkeypatch.setattr(notion, "_pending", threading.BoundedSemaphore(1))
+    ran = []
+    release = threading.Event()
+
+    first = notion._submit(1, lambda: release.wait(5) and ran.append(1))
+    assert first is not None
+    assert notion._submit(2, ran.append, 2) is None
+    assert notion.submit_task_created(_NotionSettings(), db_path, _create(db_path, ["x"])[0]) is None
+
+    release.set()
+    first.result(timeout=5)
+    second = notion._submit(2, ran.append, 2)
+    assert second is not None
+    second.result(timeout=5)
+    assert ran == [1, 2]
+
+
+def test_retry_policy_only_repeats_posts_on_rate_limit():
+    retry = notion._session.get_adapter("https://api.notion.com/v1/pages").max_retries
+    assert retry.is_retry("POST", 429)
+    assert retry.is_retry("PATCH", 429)
+    assert not retry.is_retry("POST", 503)
+    assert not retry.is_retry("PATCH", 502)
+    assert retry.is_retry("GET", 503)
+
+
+def test_token_bucket_paces_past_its_burst(monkeypatch):
+    clock = [100.0]
+    sleeps: list[float] = []
+
+    def sleep(seconds: float) -> None:
+        sleeps.append(round(seconds, 6))
+
+    monkeypatch.setattr(notion.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(notion.time, "sleep", sleep)
+    bucket = notion._TokenBucket(rate=10, capacity=2)
+
+    for _ in range(4):
+        bucket.acquire()
+    assert sleeps == [0.1, 0.2]
+
+    clock[0] += 1.0
+    bucket.acquire()
+    assert sleeps == [0.1, 0.2]
@@ -1,26 +1,27 @@
+import json
+from collections import OrderedDict
+from dataclasses import replace
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
-from src.bot import _normalize_parsed_dates
 from src.config import Settings
-from src.parser import ParsedTask, parse_task_text
+from src.parser import ParsedTask, _cleanup_title, _extract_repeat_rule, parse_task_text
+from src.utils import normalize_parsed_dates
 
 
-def _settings() -> Settings:
-    return Settings(
-        bot_token="test",
-        db_path=":memory:",
-        tz=ZoneInfo("Europe/Moscow"),
-        perplexity_api_key=None,
-        allowed_user_ids={354573537},
-    )
+_SETTINGS = Settings(
+    bot_token="test",
+    db_path=":memory:",
+    tz=ZoneInfo("Europe/Moscow"),
+    perplexity_api_key=None,
+    allowed_user_ids=frozenset({354573537}),
+)
 
 
 def test_parse_task_text_due_and_remind():
-    settings = _settings()
-    now = datetime(2026, 2, 1, 12, 0, tzinfo=settings.tz)
+    now = datetime(2026, 2, 1, 12, 0, tzinfo=_SETTINGS.tz)
     text = "созвон с клиентом завтра в 15:00 напомни за 1 час"
-    parsed = parse_task_text(text, now, settings)
+    parsed = parse_task_text(text, now, _SETTINGS)
     assert parsed.due_at is not None
     assert parsed.remind_at is not None
     assert parsed.due_at.date() == (now.date() + timedelta(days=1))
@@ -29,8 +30,7 @@ def test_parse_task_text_due_and_remind():
 
 
 def test_normalize_parsed_dates_rolls_forward_repeat():
-    settings = _settings()
-    now = datetime(2026, 2, 1, 12, 0, tzinfo=settings.tz)
+    now = datetime(2026, 2, 1, 12, 0, tzinfo=_SETTINGS.tz)
     due_at = now - timedelta(days=2)
     parsed = ParsedTask(
         title="task",
@@ -39,7 +39,125 @@ def test_normalize_parsed_dates_rolls_forward_repeat():
         remind_at=due_at - timedelta(hours=1),
         repeat_rule="daily",
     )
-    new_due, new_remind = _normalize_parsed_dates(parsed, now)
+    new_due, new_remind = normalize_parsed_dates(parsed, now)
     assert new_due is not None
     assert new_due > now
     assert new_remind == new_due - timedelta(hours=1)
+
+
+def test_cleanup_title_strips_reminder_and_repeat_phrases():
+    assert _cleanup_title("созвон с клиентом  напомни за 1 час") == "созвон с клиентом"
+    assert _cleanup_title("полить цветы ежедневно напомнить в 9:00") == "полить цветы"
+    assert _cleanup_title("Отчет каждые 2 недели") == "Отчет"
+    assert _cleanup_title("зайти в вов напомни через 2 часа") == "зайти в вов"
+    assert _cleanup_title("каждый день") == "Без названия"
+
+
+def test_extract_repeat_rule_names_each_kind():
+    assert _extract_repeat_rule("зарядка Ежедневно") == "daily"
+    assert _extract_repeat_rule("уборка каждую неделю") == "weekly"
+    assert _extract_repeat_rule("оплатить аренду каждый месяц") == "monthly"
+    assert _extract_repeat_rule("поздравить ежегодно") == "yearly"
+    assert _extract_repeat_rule("полив каждые 3 дня") == "every 3 days"
+    assert _extract_repeat_rule("купить молоко") is None
+
+
+def test_parse_task_text_resolves_weekday_and_day_part():
+    now = datetime(2026, 2, 4, 12, 0, tzinfo=_SETTINGS.tz)  # Wednesday
+    parsed = parse_task_text("отчет пятница 7 вечером", now, _SETTINGS)
+    assert parsed.due_at == datetime(2026, 2, 6, 19, 0, tzinfo=_SETTINGS.tz)
+
+    parsed = parse_task_text("планерка среда 9.30", now, _SETTINGS)
+    assert parsed.due_at == datetime(2026, 2, 11, 9, 30, tzinfo=_SETTINGS.tz)
+
+    parsed = parse_task_text("йога в субботу 9 утра", now, _SETTINGS)
+    assert parsed.due_at == datetime(2026, 2, 7, 9, 0, tzinfo=_SETTINGS.tz)
+
+    parsed = parse_task_text("ёлку нарядить завтра в 3 днём", now, _SETTINGS)
+    assert parsed.due_at == datetime(2026, 2, 5, 15, 0, tzinfo=_SETTINGS.tz)
+    assert parsed.title.startswith("ёлку")
+
+
+def test_parse_task_text_reminds_at_bare_clock_time():
+    now = datetime(2026, 2, 1, 12, 0, tzinfo=_SETTINGS.tz)
+    parsed = parse_task_text("созвон напомни в 15:00", now, _SETTINGS)
+    assert parsed.remind_at == datetime(2026, 2, 1, 15, 0, tzinfo=_SETTINGS.tz)
+
+    parsed = parse_task_text("полить цветы напомни в 9.30", now, _SETTINGS)
+    assert parsed.remind_at == datetime(2026, 2, 2, 9, 30, tzinfo=_SETTINGS.tz)
+
+
+def test_parse_task_text_skips_perplexity_without_date_words(monkeypatch):
+    def fail(settings, prompt):
+        raise AssertionError("Perplexity should not be called")
+
+    monkeypatch.setattr("src.parser.request_perplexity", fail)
+    settings = replace(_SETTINGS, perplexity_api_key="key")
+    now = datetime(2026, 2, 1, 12, 0, tzinfo=settings.tz)
+    parsed = parse_task_text("  купить молока ", now, settings)
+    assert parsed == ParsedTask(
+        title="купить молока", description=None, due_at=None, remind_at=None, repeat_rule=None
+    )
+
+
+def test_perplexity_answers_are_reused_within_the_hour(monkeypatch):
+    settings = replace(_SETTINGS, perplexity_api_key="key")
+    calls = []
+
+    def fake_request(settings, prompt):
+        calls.append(prompt)
+        return json.dumps({"title": "отчет", "due_at": "2026-02-06T18:00:00+03:00"})
+
+    monkeypatch.setattr("src.parser.request_perplexity", fake_request)
+    monkeypatch.setattr("src.parser._pplx_cache", OrderedDict())
+    now = datetime(2026, 2, 4, 12, 10, tzinfo=settings.tz)
+
+    first = parse_task_text("отчет в пятницу 18:00", now, settings)
+    second = parse_task_text("отчет в пятницу 18:00", now + timedelta(minutes=30), settings)
+    parse_task_text("отчет через 2 часа", now, settings)
+    parse_task_text("отчет через 2 часа", now, settings)
+
+    assert first == second
+    assert first.due_at == datetime(2026, 2, 6, 18, 0, tzinfo=settings.tz)
+    assert len(calls) == 3
+
+
+def test_perplexity_cache_skips_offsets_from_now(monkeypatch):
+    settings = replace(_SETTINGS, perplexity_api_key="key")
+
+    def fake_request(settings, prompt):
+        now = datetime.fromisoformat(prompt.split("Сейчас: ")[1].split(".\n")[0])
+        return json.dumps({"title": "созвон", "due_at": (now + timedelta(hours=1)).isoformat()})
+
+    monkeypatch.setattr("src.parser.request_perplexity", fake_request)
+    cache = OrderedDict()
+    monkeypatch.setattr("src.parser._pplx_cache", cache)
+    now = datetime(2026, 2, 4, 12, 5, tzinfo=settings.tz)
+
+    first = parse_task_text("созвон спустя час", now, settings)
+    later = parse_task_text("созвон спустя час", now + timedelta(minutes=40), settings)
+    parse_task_text("созвон в течение часа", now, settings)
+    parse_task_text("созвон через полчаса", now, settings)
+
+    assert first.due_at == datetime(2026, 2, 4, 13, 5, tzinfo=settings.tz)
+    assert later.due_at == datetime(2026, 2, 4, 13, 45, tzinfo=settings.tz)
+    assert not cache
+
+
+def test_perplexity_cache_skips_answers_that_have_passed(monkeypatch):
+    settings = replace(_SETTINGS, perplexity_api_key="key")
+    answers = iter(["2026-02-04T12:30:00+03:00", "2026-02-05T12:30:00+03:00"])
+
+    def fake_request(settings, prompt):
+        moment = next(answers)
+        return json.dumps({"title": "созвон", "due_at": moment, "remind_at": moment})
+
+    monkeypatch.setattr("src.parser.request_perplexity", fake_request)
+    monkeypatch.setattr("src.parser._pplx_cache", OrderedDict())
+    now = datetime(2026, 2, 4, 12, 10, tzinfo=settings.tz)
+
+    first = parse_task_text("созвон напомни в 12:30", now, settings)
+    later = parse_task_text("созвон напомни в 12:30", now + timedelta(minutes=30), settings)
+
+    assert first.remind_at == datetime(2026, 2, 4, 12, 30, tzinfo=settings.tz)
+    assert later.due_at == later.remind_at == datetime(2026, 2, 5, 12, 30, tzinfo=settings.tz)
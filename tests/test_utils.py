@@ -0,0 +1,18 @@
+from datetime import datetime, timedelta
+
+from src.utils import next_due_after, next_due_date
+
+
+def test_next_due_date_monthly_clamps_and_wraps_year():
+    assert next_due_date(datetime(2026, 1, 31, 9, 0), "monthly") == datetime(2026, 2, 28, 9, 0)
+    assert next_due_date(datetime(2026, 12, 15, 9, 0), "monthly") == datetime(2027, 1, 15, 9, 0)
+    assert next_due_date(datetime(2028, 2, 29, 9, 0), "yearly") == datetime(2029, 2, 28, 9, 0)
+
+
+def test_next_due_after_jumps_past_now_in_one_step():
+    now = datetime(2026, 2, 1, 12, 0)
+    assert next_due_after(datetime(2024, 3, 5, 9, 0), "daily", now) == datetime(2026, 2, 2, 9, 0)
+    assert next_due_after(now - timedelta(weeks=10), "every 2 weeks", now) == now + timedelta(weeks=2)
+    assert next_due_after(datetime(2025, 10, 31, 9, 0), "monthly", now) == datetime(2026, 2, 28, 9, 0)
+    assert next_due_after(datetime(2025, 8, 31, 9, 0), "monthly", datetime(2026, 3, 1)) == datetime(2026, 3, 31, 9, 0)
+    assert next_due_after(now + timedelta(hours=1), "daily", now) == now + timedelta(hours=1)